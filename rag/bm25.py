@@ -0,0 +1,264 @@
+"""
+In-process BM25 inverted index over `document_chunks.tokenized_content`.
+Chunks without tokenized content (ENABLE_JAPANESE_SEARCH off) are indexed by
+running the index's `tokenizer` over `content` instead.
+
+Postings are kept in compact `array` buffers (uint32 slot IDs and uint16 term
+frequencies) and scored with NumPy, so a keyword query is a handful of
+vectorized operations instead of a Postgres round trip. The index is updated
+incrementally from ingestion and can be snapshotted to disk; a snapshot is
+only reused when it matches the collection version recorded in the DB.
+"""
+import math
+import os
+import pickle
+import threading
+from array import array
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+from .result_cache import get_collection_version
+
+SNAPSHOT_FORMAT = 2
+MAX_TF = 65535
+
+
+class BM25Index:
+    """
+    BM25 (Okapi) index keyed by chunk ID.
+
+    Deleted chunks are tombstoned and dropped from the postings by `compact()`,
+    which runs automatically once a quarter of the slots are dead. Until then
+    document frequencies still count the dead slots.
+    """
+
+    def __init__(self, collection_name: str = "", k1: float = 1.5, b: float = 0.75,
+                 tokenizer: Optional[Callable[[str], List[str]]] = None):
+        self.collection_name = collection_name
+        self.k1 = k1
+        self.b = b
+        self.tokenizer = tokenizer
+        self.version = 0
+        self._chunk_ids: List[Optional[str]] = []
+        self._slots: Dict[str, int] = {}
+        self._doc_len = array("I")
+        self._alive = bytearray()
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._live = 0
+        self._total_len = 0
+        self._norm: Optional[np.ndarray] = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._live
+
+    def _tokens(self, tokenized_content: Optional[str], content: Optional[str]) -> List[str]:
+        if tokenized_content:
+            return tokenized_content.split(" ")
+        if self.tokenizer is not None and content:
+            return self.tokenizer(content)
+        return []
+
+    def _add(self, chunk_id: str, tokens: Iterable[str]):
+        if chunk_id in self._slots:
+            self._remove(chunk_id)
+        counts = Counter(t.lower() for t in tokens if t)
+        slot = len(self._chunk_ids)
+        self._chunk_ids.append(chunk_id)
+        self._slots[chunk_id] = slot
+        length = sum(counts.values())
+        self._doc_len.append(length)
+        self._alive.append(1)
+        self._live += 1
+        self._total_len += length
+        for term, tf in counts.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = (array("I"), array("H"))
+            posting[0].append(slot)
+            posting[1].append(min(tf, MAX_TF))
+
+    def _remove(self, chunk_id: str):
+        slot = self._slots.pop(chunk_id, None)
+        if slot is None:
+            return
+        self._alive[slot] = 0
+        self._chunk_ids[slot] = None
+        self._live -= 1
+        self._total_len -= self._doc_len[slot]
+
+    def add(self, chunk_id: str, tokens: Iterable[str]):
+        with self._lock:
+            self._add(chunk_id, tokens)
+            self._norm = None
+
+    def add_rows(self, rows: List[Dict[str, Any]]):
+        """Ingestion listener: indexes rows written to document_chunks."""
+        with self._lock:
+            for row in rows:
+                self._add(row["cid"], self._tokens(row.get("tok_cont"), row.get("cont")))
+            self._norm = None
+
+    def remove_many(self, chunk_ids: List[str]):
+        """Ingestion listener: drops deleted chunks."""
+        with self._lock:
+            for chunk_id in chunk_ids:
+                self._remove(chunk_id)
+            self._norm = None
+            if len(self._chunk_ids) > 0 and self._live < 0.75 * len(self._chunk_ids):
+                self.compact()
+
+    def compact(self):
+        """Rewrites slots and postings without the tombstoned chunks."""
+        with self._lock:
+            remap = array("I", [0] * len(self._chunk_ids))
+            chunk_ids: List[Optional[str]] = []
+            doc_len = array("I")
+            for slot, chunk_id in enumerate(self._chunk_ids):
+                if chunk_id is not None and self._alive[slot]:
+                    remap[slot] = len(chunk_ids)
+                    chunk_ids.append(chunk_id)
+                    doc_len.append(self._doc_len[slot])
+            postings: Dict[str, Tuple[array, array]] = {}
+            for term, (slots, tfs) in self._postings.items():
+                new_slots, new_tfs = array("I"), array("H")
+                for slot, tf in zip(slots, tfs):
+                    if self._alive[slot]:
+                        new_slots.append(remap[slot])
+                        new_tfs.append(tf)
+                if new_slots:
+                    postings[term] = (new_slots, new_tfs)
+            self._chunk_ids = chunk_ids
+            self._slots = {chunk_id: slot for slot, chunk_id in enumerate(chunk_ids)}
+            self._doc_len = doc_len
+            self._alive = bytearray([1]) * len(chunk_ids)
+            self._postings = postings
+            self._norm = None
+
+    def _length_norm(self) -> np.ndarray:
+        if self._norm is None:
+            doc_len = np.frombuffer(self._doc_len, dtype=np.uint32).astype(np.float32)
+            avgdl = (self._total_len / self._live) if self._live else 1.0
+            self._norm = self.k1 * (1.0 - self.b + self.b * doc_len / max(avgdl, 1e-9))
+        return self._norm
+
+    def search(self, query_tokens: List[str], k: int) -> List[Tuple[str, float]]:
+        """Returns up to `k` (chunk_id, score) pairs, best first."""
+        terms = {t.lower() for t in query_tokens if t}
+        with self._lock:
+            if not terms or not self._live:
+                return []
+            n_slots = len(self._chunk_ids)
+            norm = self._length_norm()
+            scores = np.zeros(n_slots, dtype=np.float32)
+            for term in terms:
+                posting = self._postings.get(term)
+                if posting is None:
+                    continue
+                slots = np.frombuffer(posting[0], dtype=np.uint32)
+                tfs = np.frombuffer(posting[1], dtype=np.uint16).astype(np.float32)
+                df = len(slots)
+                idf = math.log(1.0 + (self._live - df + 0.5) / (df + 0.5))
+                scores[slots] += idf * tfs * (self.k1 + 1.0) / (tfs + norm[slots])
+                del slots
+            scores *= np.frombuffer(self._alive, dtype=np.uint8)
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+            ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+            return [(self._chunk_ids[slot], float(scores[slot])) for slot in ranked]
+
+    def advance_version(self, version: Optional[int]):
+        """
+        Follows one of this process's own collection bumps. A gap (another process
+        changed the collection, unseen by this index) or a failed bump leaves the
+        version unknown (None), so a snapshot is never taken for current and the
+        next `load_or_build_bm25_index` rebuilds from the DB.
+        """
+        with self._lock:
+            if self.version is not None and version is not None and version == self.version + 1:
+                self.version = version
+            else:
+                if self.version is not None:
+                    print("[BM25] collection changed outside this process; the snapshot will be rebuilt on next load.")
+                self.version = None
+
+    def save(self, path: str):
+        """Writes an atomic snapshot of the index."""
+        with self._lock:
+            if self._live < len(self._chunk_ids):
+                self.compact()
+            state = {
+                "format": SNAPSHOT_FORMAT, "collection_name": self.collection_name, "version": self.version,
+                "k1": self.k1, "b": self.b, "chunk_ids": self._chunk_ids, "doc_len": self._doc_len,
+                "postings": self._postings, "total_len": self._total_len,
+            }
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, tokenizer: Optional[Callable[[str], List[str]]] = None) -> "BM25Index":
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        if state.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported BM25 snapshot format: {state.get('format')}")
+        index = cls(state["collection_name"], state["k1"], state["b"], tokenizer)
+        index.version = state["version"]
+        index._chunk_ids = state["chunk_ids"]
+        index._slots = {chunk_id: slot for slot, chunk_id in enumerate(index._chunk_ids)}
+        index._doc_len = state["doc_len"]
+        index._alive = bytearray([1]) * len(index._chunk_ids)
+        index._postings = state["postings"]
+        index._live = len(index._chunk_ids)
+        index._total_len = state["total_len"]
+        return index
+
+    @classmethod
+    def build_from_db(cls, engine, collection_name: str, k1: float = 1.5, b: float = 0.75,
+                      tokenizer: Optional[Callable[[str], List[str]]] = None) -> "BM25Index":
+        index = cls(collection_name, k1, b, tokenizer)
+        with engine.connect() as conn:
+            index.version = get_collection_version(conn, collection_name)
+            # content is only shipped for rows that have no tokenized_content
+            result = conn.execution_options(stream_results=True, yield_per=5000).execute(
+                text("""
+                    SELECT chunk_id, tokenized_content,
+                           CASE WHEN coalesce(tokenized_content, '') = '' THEN content END AS content
+                    FROM document_chunks WHERE collection_name = :coll
+                """),
+                {"coll": collection_name}
+            )
+            for row in result:
+                index._add(row.chunk_id, index._tokens(row.tokenized_content, row.content))
+        return index
+
+
+def load_or_build_bm25_index(engine, collection_name: str, snapshot_path: str,
+                             k1: float = 1.5, b: float = 0.75,
+                             tokenizer: Optional[Callable[[str], List[str]]] = None) -> BM25Index:
+    """
+    Loads the snapshot if it matches the collection's current version, otherwise rebuilds from the DB.
+    `tokenizer` indexes chunks stored without tokenized_content; it should match how queries are tokenized.
+    """
+    with engine.connect() as conn:
+        version = get_collection_version(conn, collection_name)
+    if snapshot_path and os.path.exists(snapshot_path):
+        try:
+            index = BM25Index.load(snapshot_path, tokenizer)
+            if index.collection_name == collection_name and index.version == version:
+                return index
+            print("[BM25] snapshot is stale, rebuilding from document_chunks...")
+        except Exception as e:
+            print(f"[BM25] could not load snapshot {snapshot_path}: {e}")
+
+    index = BM25Index.build_from_db(engine, collection_name, k1, b, tokenizer)
+    if snapshot_path:
+        index.save(snapshot_path)
+    print(f"[BM25] indexed {len(index)} chunks for collection '{collection_name}'.")
+    return index
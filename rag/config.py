@@ -11,6 +11,13 @@ class Config:
     db_user: str = os.getenv("DB_USER", "postgres")
     db_password: str = os.getenv("DB_PASSWORD", "your-password")
 
+    # Connection pool settings (shared engine registry)
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", 5))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    db_pool_pre_ping: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    db_pool_timeout: int = int(os.getenv("DB_POOL_TIMEOUT", 30))
+
     # OpenAI API settings
     openai_api_key: Optional[str] = os.getenv("OPENAI_API_KEY")
     embedding_model_identifier: str = os.getenv("EMBEDDING_MODEL_IDENTIFIER", "text-embedding-3-small")
@@ -31,6 +38,38 @@ class Config:
     child_chunk_overlap: int = int(os.getenv("CHILD_CHUNK_OVERLAP", 100))
     chunk_size: int = int(os.getenv("CHUNK_SIZE", 1000)) # Kept for fallback
     chunk_overlap: int = int(os.getenv("CHUNK_OVERLAP", 200)) # Kept for fallback
+    pdf_text_coalescing: str = os.getenv("PDF_TEXT_COALESCING", "page") # "page": merge a page's text blocks before splitting, "none": one Document per block
+    pdf_coalesce_max_chars: int = int(os.getenv("PDF_COALESCE_MAX_CHARS", 4000)) # upper bound of a merged span; 0 = whole page
+    ingestion_workers: int = int(os.getenv("INGESTION_WORKERS", 0)) # parsing processes; 0 = one per CPU core, 1 = in-process
+    ingestion_file_timeout: int = int(os.getenv("INGESTION_FILE_TIMEOUT", 600)) # seconds per file before its worker is killed; 0 = no limit
+    pdf_shard_pages: int = int(os.getenv("PDF_SHARD_PAGES", 100)) # pages per parsing worker and per streamed ingestion batch for PDFs; 0 = whole file
+    image_summary_concurrency: int = int(os.getenv("IMAGE_SUMMARY_CONCURRENCY", 4)) # parallel multimodal summary requests
+    image_summary_rpm: int = int(os.getenv("IMAGE_SUMMARY_RPM", 0)) # request starts per minute across threads; 0 = unlimited
+    image_summary_max_retries: int = int(os.getenv("IMAGE_SUMMARY_MAX_RETRIES", 5)) # retries on 429 / transient errors
+    image_summary_max_backoff: float = float(os.getenv("IMAGE_SUMMARY_MAX_BACKOFF", 30)) # seconds, before jitter
+    image_dedupe: bool = os.getenv("IMAGE_DEDUPE", "true").lower() == "true" # keep only the first occurrence of an image within a document
+    image_min_side: int = int(os.getenv("IMAGE_MIN_SIDE", 32)) # px; smaller images (icons, rules) are dropped
+    # bits; images below are dropped as near-uniform. Off by default: two-tone line art (diagrams,
+    # charts, scanned text) also scores under 1 bit, so raise this only for decorative-heavy corpora
+    image_min_entropy: float = float(os.getenv("IMAGE_MIN_ENTROPY", 0))
+    image_summary_max_side: int = int(os.getenv("IMAGE_SUMMARY_MAX_SIDE", 1024)) # px; downscale before upload, 0 = full size
+    image_summary_jpeg_quality: int = int(os.getenv("IMAGE_SUMMARY_JPEG_QUALITY", 85))
+    image_summary_detail: str = os.getenv("IMAGE_SUMMARY_DETAIL", "high") # "high", "low" or "auto"
+    enable_image_summary_cache: bool = os.getenv("ENABLE_IMAGE_SUMMARY_CACHE", "true").lower() == "true" # reuse summaries of identical image bytes
+    enable_incremental_ingestion: bool = os.getenv("ENABLE_INCREMENTAL_INGESTION", "true").lower() == "true" # skip files unchanged since their last ingestion
+    chunk_id_mode: str = os.getenv("CHUNK_ID_MODE", "positional") # "positional" or "content" (hash IDs, chunk-level diff on re-ingest)
+    ingestion_batch_size: int = int(os.getenv("INGESTION_BATCH_SIZE", 256)) # chunks per embed + store micro-batch
+    ingestion_prefetch_files: int = int(os.getenv("INGESTION_PREFETCH_FILES", 2)) # loaded batches (files or PDF page ranges) buffered ahead of chunking/embedding
+    # Ingestion embedding: token-packed requests run concurrently under the deployment's quota
+    enable_concurrent_embedding: bool = os.getenv("ENABLE_CONCURRENT_EMBEDDING", "true").lower() == "true"
+    embedding_concurrency: int = int(os.getenv("EMBEDDING_CONCURRENCY", 4))
+    embedding_tpm: int = int(os.getenv("EMBEDDING_TPM", 0)) # deployment tokens-per-minute quota; 0 = unlimited
+    embedding_rpm: int = int(os.getenv("EMBEDDING_RPM", 0)) # deployment requests-per-minute quota; 0 = unlimited
+    embedding_max_tokens_per_request: int = int(os.getenv("EMBEDDING_MAX_TOKENS_PER_REQUEST", 16000))
+    embedding_max_texts_per_request: int = int(os.getenv("EMBEDDING_MAX_TEXTS_PER_REQUEST", 256))
+    embedding_max_retries: int = int(os.getenv("EMBEDDING_MAX_RETRIES", 5))
+    embedding_max_backoff: float = float(os.getenv("EMBEDDING_MAX_BACKOFF", 30)) # seconds, before jitter
+    keyword_write_batch_size: int = int(os.getenv("KEYWORD_WRITE_BATCH_SIZE", 1000)) # rows per COPY + upsert into document_chunks
     vector_search_k: int = int(os.getenv("VECTOR_SEARCH_K", 10))
     keyword_search_k: int = int(os.getenv("KEYWORD_SEARCH_K", 10))
     final_k: int = int(os.getenv("FINAL_K", 5))
@@ -43,6 +82,47 @@ class Config:
     # 言語設定（英語と日本語の両方をサポート）
     fts_language: str = os.getenv("FTS_LANGUAGE", "english")
     rrf_k_for_fusion: int = int(os.getenv("RRF_K_FOR_FUSION", 60))
+    # "python": two queries fused with RRF in Python, "sql": both legs and RRF in one SQL statement
+    hybrid_engine: str = os.getenv("HYBRID_ENGINE", "python")
+    # Vector leg: "pgvector" or "local" (memory-mapped float16/int8 matrix searched in-process)
+    vector_engine: str = os.getenv("VECTOR_ENGINE", "pgvector")
+    local_vector_dir: str = os.getenv("LOCAL_VECTOR_DIR", "output/local_vectors")
+    local_vector_dtype: str = os.getenv("LOCAL_VECTOR_DTYPE", "float16") # "float16" or "int8"
+    # Fuse on (chunk_id, score) only and fetch content for the surviving final_k chunks
+    enable_lazy_hydration: bool = os.getenv("ENABLE_LAZY_HYDRATION", "false").lower() == "true"
+    # Keyword leg: "postgres" (tsvector FTS) or "bm25" (in-process index over tokenized_content)
+    keyword_engine: str = os.getenv("KEYWORD_ENGINE", "postgres")
+    bm25_k1: float = float(os.getenv("BM25_K1", 1.5))
+    bm25_b: float = float(os.getenv("BM25_B", 0.75))
+    bm25_snapshot_dir: str = os.getenv("BM25_SNAPSHOT_DIR", "output/bm25")
+
+    # ANN index on the pgvector embedding table ("hnsw", "ivfflat" or "none")
+    vector_index_type: str = os.getenv("VECTOR_INDEX_TYPE", "hnsw")
+    vector_index_hnsw_m: int = int(os.getenv("VECTOR_INDEX_HNSW_M", 16))
+    vector_index_hnsw_ef_construction: int = int(os.getenv("VECTOR_INDEX_HNSW_EF_CONSTRUCTION", 64))
+    vector_index_ivfflat_lists: int = int(os.getenv("VECTOR_INDEX_IVFFLAT_LISTS", 100))
+    vector_search_ef_search: int = int(os.getenv("VECTOR_SEARCH_EF_SEARCH", 40))
+    vector_search_ivfflat_probes: int = int(os.getenv("VECTOR_SEARCH_IVFFLAT_PROBES", 10))
+    embedding_dimensions: int = int(os.getenv("EMBEDDING_DIMENSIONS", 0)) # 0 = detect from stored embeddings
+
+    # Query embedding cache
+    enable_query_embedding_cache: bool = os.getenv("ENABLE_QUERY_EMBEDDING_CACHE", "true").lower() == "true"
+    query_embedding_cache_size: int = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 2048))
+    query_embedding_cache_ttl: int = int(os.getenv("QUERY_EMBEDDING_CACHE_TTL", 3600))
+    enable_persistent_embedding_cache: bool = os.getenv("ENABLE_PERSISTENT_EMBEDDING_CACHE", "false").lower() == "true"
+
+    # Retrieval result cache (invalidated through per-collection versions in the DB)
+    enable_result_cache: bool = os.getenv("ENABLE_RESULT_CACHE", "true").lower() == "true"
+    result_cache_size: int = int(os.getenv("RESULT_CACHE_SIZE", 512))
+    result_cache_ttl: int = int(os.getenv("RESULT_CACHE_TTL", 600))
+    result_cache_version_check_interval: float = float(os.getenv("RESULT_CACHE_VERSION_CHECK_INTERVAL", 2.0))
+
+    # Parent chunk cache for parent/child retrieval
+    enable_parent_chunk_cache: bool = os.getenv("ENABLE_PARENT_CHUNK_CACHE", "true").lower() == "true"
+    parent_chunk_cache_size: int = int(os.getenv("PARENT_CHUNK_CACHE_SIZE", 4096))
+    parent_chunk_cache_max_mb: int = int(os.getenv("PARENT_CHUNK_CACHE_MAX_MB", 64))
+    parent_chunk_cache_ttl: int = int(os.getenv("PARENT_CHUNK_CACHE_TTL", 3600))
+    parent_chunk_cache_prefetch: int = int(os.getenv("PARENT_CHUNK_CACHE_PREFETCH", 0)) # most recent parents loaded at startup
 
     # Text-to-SQL settings
     enable_text_to_sql: bool = True 
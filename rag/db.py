@@ -0,0 +1,194 @@
+"""
+Process-wide SQLAlchemy engine registry.
+
+All components (retriever, ingestion, jargon dictionary, SQL handler and the
+UI helpers) share one pooled engine per connection string instead of creating
+a fresh engine, pool and Postgres handshake on every call.
+"""
+import asyncio
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+    ASYNC_SQLALCHEMY_AVAILABLE = True
+except ImportError:
+    AsyncEngine = Any
+    ASYNC_SQLALCHEMY_AVAILABLE = False
+
+from .config import Config
+
+
+class EngineRegistry:
+    """Keeps one pooled SQLAlchemy engine per connection string."""
+
+    def __init__(self):
+        self._engines: Dict[str, Engine] = {}
+        self._pool_settings: Dict[str, Tuple[Any, ...]] = {}
+        # Async engines are bound to the event loop that created their connections;
+        # they are disposed by `adispose` on that loop (see `run_async`)
+        self._async_engines: Dict[asyncio.AbstractEventLoop, Dict[str, AsyncEngine]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _pool_kwargs(config: Config) -> Dict[str, Any]:
+        return {
+            "pool_size": config.db_pool_size,
+            "max_overflow": config.db_max_overflow,
+            "pool_pre_ping": config.db_pool_pre_ping,
+            "pool_recycle": config.db_pool_recycle,
+            "pool_timeout": config.db_pool_timeout,
+        }
+
+    def get_engine(self, connection_string: str, config: Optional[Config] = None) -> Engine:
+        """
+        Returns the shared engine for `connection_string`, creating it on first use.
+
+        When `config` is given and its pool settings differ from the ones the
+        existing engine was built with, the old engine is disposed and replaced.
+        Callers without a config always reuse whatever engine is registered.
+        """
+        with self._lock:
+            engine = self._engines.get(connection_string)
+            if engine is not None and config is None:
+                return engine
+
+            pool_kwargs = self._pool_kwargs(config or Config())
+            settings = tuple(sorted(pool_kwargs.items()))
+            if engine is not None and self._pool_settings.get(connection_string) == settings:
+                return engine
+
+            if engine is not None:
+                engine.dispose()
+            engine = create_engine(connection_string, **pool_kwargs)
+            self._engines[connection_string] = engine
+            self._pool_settings[connection_string] = settings
+            return engine
+
+    @staticmethod
+    def async_url(connection_string: str) -> Optional[str]:
+        """Maps a sync connection string to an async-capable one, or None if the driver has no async mode."""
+        url = make_url(connection_string)
+        if url.drivername in ("postgresql+psycopg", "postgresql+asyncpg"):
+            return connection_string
+        if url.drivername in ("postgresql", "postgresql+psycopg2"):
+            try:
+                import psycopg  # noqa: F401
+            except ModuleNotFoundError:
+                return None
+            return url.set(drivername="postgresql+psycopg").render_as_string(hide_password=False)
+        return None
+
+    def get_async_engine(self, connection_string: str) -> Optional[AsyncEngine]:
+        """
+        Returns the async engine for `connection_string` on the running event loop.
+
+        Returns None when SQLAlchemy's asyncio extension or an async driver is
+        not available; callers should then fall back to the sync engine in a
+        worker thread.
+        """
+        if not ASYNC_SQLALCHEMY_AVAILABLE:
+            return None
+        async_url = self.async_url(connection_string)
+        if async_url is None:
+            return None
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._forget_closed_loops()
+            engines = self._async_engines.setdefault(loop, {})
+            engine = engines.get(connection_string)
+            if engine is None:
+                settings = self._pool_settings.get(connection_string)
+                pool_kwargs = dict(settings) if settings else self._pool_kwargs(Config())
+                engine = create_async_engine(async_url, **pool_kwargs)
+                engines[connection_string] = engine
+            return engine
+
+    def _forget_closed_loops(self):
+        """Drops engines of loops that closed without `adispose`; their connections can no longer be closed cleanly."""
+        for loop in [loop for loop in self._async_engines if loop.is_closed()]:
+            engines = self._async_engines.pop(loop)
+            print(f"[EngineRegistry] {len(engines)} async engine(s) of a closed event loop were not disposed; use run_async() or adispose().")
+            for engine in engines.values():
+                engine.sync_engine.dispose(close=False)
+
+    async def adispose(self):
+        """Closes the running event loop's async engines. Call before the loop shuts down."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            engines = self._async_engines.pop(loop, {})
+        for engine in engines.values():
+            await engine.dispose()
+
+    def pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns pool utilization for every registered engine, keyed by masked URL."""
+        stats: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            engines = list(self._engines.values())
+        for engine in engines:
+            pool = engine.pool
+            size = pool.size() if hasattr(pool, "size") else 0
+            checked_out = pool.checkedout() if hasattr(pool, "checkedout") else 0
+            overflow = pool.overflow() if hasattr(pool, "overflow") else 0
+            capacity = size + max(getattr(pool, "_max_overflow", 0), 0)
+            stats[engine.url.render_as_string(hide_password=True)] = {
+                "pool_size": size,
+                "checked_out": checked_out,
+                "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else 0,
+                "overflow": overflow,
+                "utilization": (checked_out / capacity) if capacity else 0.0,
+                "status": pool.status(),
+            }
+        return stats
+
+    def dispose_all(self):
+        """Closes every pooled connection and forgets all engines."""
+        with self._lock:
+            for engine in self._engines.values():
+                engine.dispose()
+            self._engines.clear()
+            self._pool_settings.clear()
+            # Async pools can only be closed on their own loop (`adispose`); here they are just released
+            for engines in self._async_engines.values():
+                for engine in engines.values():
+                    engine.sync_engine.dispose(close=False)
+            self._async_engines.clear()
+
+
+_registry = EngineRegistry()
+
+
+def get_engine_registry() -> EngineRegistry:
+    """Returns the process-wide engine registry."""
+    return _registry
+
+
+def get_engine(connection_string: str, config: Optional[Config] = None) -> Engine:
+    """Shortcut for `get_engine_registry().get_engine(...)`."""
+    return _registry.get_engine(connection_string, config)
+
+
+def get_async_engine(connection_string: str) -> Optional[AsyncEngine]:
+    """Shortcut for `get_engine_registry().get_async_engine(...)`."""
+    return _registry.get_async_engine(connection_string)
+
+
+async def adispose_async_engines():
+    """Shortcut for `get_engine_registry().adispose()`."""
+    await _registry.adispose()
+
+
+def run_async(coro):
+    """
+    `asyncio.run` that disposes the loop's async engines before the loop closes,
+    so each short-lived loop returns its connections instead of leaking them.
+    """
+    async def main():
+        try:
+            return await coro
+        finally:
+            await _registry.adispose()
+    return asyncio.run(main())
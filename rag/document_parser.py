@@ -1,16 +1,36 @@
-import fitz  # PyMuPDF
 import os
 import base64
-from typing import List, Dict, Any, Tuple
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
 from PIL import Image
 import io
+import openai
 from langchain_core.messages import HumanMessage
 from langchain_openai import AzureChatOpenAI
 
+from .file_loader import ImageFilter, parse_pdf_file, iter_pdf_pages
+from .image_summary_cache import image_hash
+from .rate_limit import RETRYABLE_ERRORS, RequestPacer, backoff_delay
+
+IMAGE_SUMMARY_PROMPT = "この画像について、内容を詳細に説明してください。グラフであれば、その傾向や読み取れる重要な数値を具体的に記述してください。図であれば、その構造や要素間の関係性を説明してください。"
+IMAGE_SUMMARY_FALLBACK = "画像の内容を要約できませんでした。"
+
+
 class DocumentParser:
-    def __init__(self, config, image_output_dir: str = "output/images"):
+    # Bump when parsing output changes, so the document registry re-ingests existing files
+    PARSER_VERSION = "4"
+    # Bump when IMAGE_SUMMARY_PROMPT (or how images are sent) changes, so cached summaries are not reused
+    IMAGE_SUMMARY_PROMPT_VERSION = "1"
+
+    def __init__(self, config, image_output_dir: str = "output/images", summary_cache=None):
         self.image_output_dir = image_output_dir
         self.config = config
+        self.summary_cache = summary_cache
+        self.image_filter = ImageFilter(
+            dedupe=config.image_dedupe, min_side=config.image_min_side, min_entropy=config.image_min_entropy
+        )
         if not os.path.exists(self.image_output_dir):
             os.makedirs(self.image_output_dir)
         
@@ -24,105 +44,171 @@ class DocumentParser:
             api_version=config.azure_openai_api_version,
             azure_deployment=config.azure_openai_chat_deployment_name,
             temperature=0.1, # Lower temperature for more factual summaries
-            max_tokens=512
+            max_tokens=512,
+            max_retries=0 # retries are paced by summarize_images
         )
+        self.pacer = RequestPacer(config.image_summary_rpm)
 
     def parse_pdf(self, file_path: str) -> Dict[str, List[Any]]:
         """
         Parses a PDF file to extract text, images, and tables.
-        
-        Returns:
-            A dictionary containing lists of extracted elements:
-            - "texts": List of (text_content, metadata)
-            - "images": List of (image_path, metadata)
-            - "tables": List of (table_data, metadata)
+        See `rag.file_loader.parse_pdf_file` (which worker processes call directly).
         """
-        doc = fitz.open(file_path)
-        
-        extracted_elements = {
-            "texts": [],
-            "images": [],
-            "tables": []
-        }
-        
-        base_filename = os.path.splitext(os.path.basename(file_path))[0]
-
-        for page_num, page in enumerate(doc):
-            # 1. Extract text blocks
-            text_blocks = page.get_text("blocks")
-            for i, block in enumerate(text_blocks):
-                text = block[4]
-                metadata = {
-                    "source": file_path,
-                    "page_number": page_num + 1,
-                    "type": "text",
-                    "block_number": i
-                }
-                extracted_elements["texts"].append((text, metadata))
-
-            # 2. Extract images
-            image_list = page.get_images(full=True)
-            for img_index, img in enumerate(image_list):
-                xref = img[0]
-                base_image = doc.extract_image(xref)
-                image_bytes = base_image["image"]
-                
-                image_filename = f"{base_filename}_p{page_num+1}_img{img_index}.png"
-                image_path = os.path.join(self.image_output_dir, image_filename)
-                
-                with open(image_path, "wb") as img_file:
-                    img_file.write(image_bytes)
-                
-                metadata = {
-                    "source": file_path,
-                    "page_number": page_num + 1,
-                    "type": "image",
-                    "image_path": image_path
-                }
-                extracted_elements["images"].append((image_path, metadata))
-
-            # 3. Extract tables
-            tabs = page.find_tables()
-            for i, tab in enumerate(tabs):
-                # This gives a list of lists (rows and cells)
-                table_data = tab.extract()
-                metadata = {
-                    "source": file_path,
-                    "page_number": page_num + 1,
-                    "type": "table",
-                    "table_number": i
-                }
-                extracted_elements["tables"].append((table_data, metadata))
-
-        doc.close()
-        return extracted_elements
+        return parse_pdf_file(file_path, self.image_output_dir, image_filter=self.image_filter)
 
-    def summarize_image(self, image_path: str) -> str:
+    def iter_parse_pdf(self, file_path: str) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of `parse_pdf`: yields {"page_number", "texts", "images", "tables"}
+        per page, so peak memory does not grow with the page count.
+        """
+        return iter_pdf_pages(file_path, self.image_output_dir, image_filter=self.image_filter)
+
+    @classmethod
+    def summary_cache_version(cls, config) -> str:
+        """Prompt version plus the upload settings that change what the model sees."""
+        return (f"{cls.IMAGE_SUMMARY_PROMPT_VERSION}:{config.image_summary_detail}"
+                f":{config.image_summary_max_side}:{config.image_summary_jpeg_quality}")
+
+    def _prepare_image(self, image_bytes: bytes) -> Tuple[bytes, str]:
+        """
+        Downscales the image to `image_summary_max_side` and re-encodes it (JPEG,
+        or PNG when it has transparency) if that makes the upload smaller.
+        Returns (bytes, mime type); undecodable images are sent as-is.
+        """
+        max_side = self.config.image_summary_max_side
+        try:
+            with Image.open(io.BytesIO(image_bytes)) as image:
+                image.load()
+                resized = bool(max_side) and max(image.size) > max_side
+                if resized:
+                    image.thumbnail((max_side, max_side))
+                has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+                buffer = io.BytesIO()
+                if has_alpha:
+                    image.save(buffer, format="PNG", optimize=True)
+                    mime = "image/png"
+                else:
+                    image.convert("RGB").save(buffer, format="JPEG", quality=self.config.image_summary_jpeg_quality, optimize=True)
+                    mime = "image/jpeg"
+        except Exception:
+            return image_bytes, "image/png"
+        if resized or buffer.tell() < len(image_bytes):
+            return buffer.getvalue(), mime
+        return image_bytes, "image/png"
+
+    def _invoke_image_summary(self, image_bytes: bytes) -> str:
+        image_bytes, mime = self._prepare_image(image_bytes)
+        image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+
+        message = HumanMessage(
+            content=[
+                {"type": "text", "text": IMAGE_SUMMARY_PROMPT},
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:{mime};base64,{image_base64}",
+                        "detail": self.config.image_summary_detail
+                    }
+                },
+            ]
+        )
+
+        response = self.llm.invoke([message])
+        return response.content
+
+    def _summarize_uncached(self, image_path: str) -> Optional[str]:
         """
-        Generates a summary for an image using a multi-modal LLM.
+        Calls the vision model for one image. Rate limits and transient errors are
+        retried with exponential backoff (honouring Retry-After); returns None on failure.
         """
         try:
             with open(image_path, "rb") as image_file:
-                image_base64 = base64.b64encode(image_file.read()).decode('utf-8')
-
-            message = HumanMessage(
-                content=[
-                    {"type": "text", "text": "この画像について、内容を詳細に説明してください。グラフであれば、その傾向や読み取れる重要な数値を具体的に記述してください。図であれば、その構造や要素間の関係性を説明してください。"},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/png;base64,{image_base64}",
-                            "detail": "high"
-                        }
-                    },
-                ]
-            )
-            
-            response = self.llm.invoke([message])
-            return response.content
-        except Exception as e:
+                image_bytes = image_file.read()
+        except OSError as e:
             print(f"Error summarizing image {image_path}: {e}")
-            return "画像の内容を要約できませんでした。"
+            return None
+
+        max_retries = self.config.image_summary_max_retries
+        for attempt in range(max_retries + 1):
+            self.pacer.wait()
+            try:
+                return self._invoke_image_summary(image_bytes)
+            except RETRYABLE_ERRORS as e:
+                if attempt == max_retries:
+                    print(f"Error summarizing image {image_path}: giving up after {attempt + 1} attempts - {e}")
+                    break
+                delay = backoff_delay(e, attempt, self.config.image_summary_max_backoff)
+                if isinstance(e, openai.RateLimitError):
+                    self.pacer.pause(delay)
+                time.sleep(delay)
+            except Exception as e:
+                print(f"Error summarizing image {image_path}: {e}")
+                break
+        return None
+
+    def summarize_image(self, image_path: str) -> str:
+        """
+        Generates a summary for an image using a multi-modal LLM, reusing the
+        cached summary of identical image bytes when a summary cache is set.
+        """
+        return self.summarize_images([image_path])[0]
+
+    @staticmethod
+    def _image_keys(image_paths: List[str]) -> List[Any]:
+        """Content hash per image; an unreadable file gets a unique placeholder key so it is never shared."""
+        keys = []
+        for i, image_path in enumerate(image_paths):
+            try:
+                with open(image_path, "rb") as image_file:
+                    keys.append(image_hash(image_file.read()))
+            except OSError:
+                keys.append(("unreadable", i))
+        return keys
+
+    def summarize_images(self, image_paths: List[str],
+                         progress: Optional[Callable[[int, int], None]] = None) -> List[str]:
+        """
+        Summarizes images concurrently with at most `image_summary_concurrency`
+        requests in flight. Identical images (by content hash) are summarized once,
+        and with a summary cache only images never summarized before reach the
+        model. Returns summaries in input order; `progress` is called with
+        (completed, total) as images finish, cached ones first.
+        """
+        total = len(image_paths)
+        keys = self._image_keys(image_paths)
+        distinct: Dict[Any, str] = {}
+        for image_path, key in zip(image_paths, keys):
+            distinct.setdefault(key, image_path)
+
+        summaries: Dict[Any, str] = {}
+        if self.summary_cache is not None:
+            summaries.update(self.summary_cache.get_many([key for key in distinct if isinstance(key, str)]))
+        to_summarize = {key: path for key, path in distinct.items() if key not in summaries}
+
+        copies = Counter(keys)
+        completed = sum(n for key, n in copies.items() if key not in to_summarize)
+        if progress and completed:
+            progress(completed, total)
+
+        fresh: Dict[str, str] = {}
+        workers = max(1, min(self.config.image_summary_concurrency, len(to_summarize)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-summary") as executor:
+            futures = {executor.submit(self._summarize_uncached, path): key for key, path in to_summarize.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                summary = future.result()
+                if summary is None:
+                    summary = IMAGE_SUMMARY_FALLBACK
+                elif isinstance(key, str):
+                    fresh[key] = summary
+                summaries[key] = summary
+                completed += copies[key]
+                if progress:
+                    progress(completed, total)
+
+        if self.summary_cache is not None:
+            self.summary_cache.put_many(fresh)
+        return [summaries[key] for key in keys]
 
     def format_table_as_markdown(self, table_data: List[List[str]]) -> str:
         """
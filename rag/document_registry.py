@@ -0,0 +1,133 @@
+"""
+Registry of ingested source files, used to skip unchanged documents on re-ingestion.
+
+Each source is recorded with its content hash, size, mtime, the parser version
+and the chunking/embedding settings it was ingested with. A file is unchanged
+when all of those still match. Size and mtime are checked first, so unchanged
+files are usually not even read; the hash catches re-copied files whose mtime moved.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import text
+
+DOCUMENT_REGISTRY_TABLE = "document_registry"
+
+
+def init_document_registry_table(conn):
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {DOCUMENT_REGISTRY_TABLE} (
+            collection_name TEXT NOT NULL,
+            source_path TEXT NOT NULL,
+            document_id TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            file_size BIGINT NOT NULL,
+            mtime DOUBLE PRECISION NOT NULL,
+            parser_version TEXT NOT NULL,
+            chunking_config TEXT NOT NULL,
+            ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (collection_name, source_path)
+        )
+    """))
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunking_config_signature(config) -> str:
+    """The settings that change the stored chunks or their vectors, as canonical JSON."""
+    return json.dumps({
+        "parent_child": config.enable_parent_child_chunking,
+        "parent": [config.parent_chunk_size, config.parent_chunk_overlap],
+        "child": [config.child_chunk_size, config.child_chunk_overlap],
+        "chunk": [config.chunk_size, config.chunk_overlap],
+        "pdf_text_coalescing": [config.pdf_text_coalescing, config.pdf_coalesce_max_chars],
+        "japanese_search": config.enable_japanese_search,
+        "chunk_id_mode": config.chunk_id_mode,
+        "embedding_deployment": config.azure_openai_embedding_deployment_name,
+    }, sort_keys=True)
+
+
+class DocumentRegistry:
+    def __init__(self, engine, collection_name: str, parser_version: str, chunking_config: str):
+        self.engine = engine
+        self.collection_name = collection_name
+        self.parser_version = parser_version
+        self.chunking_config = chunking_config
+
+    @staticmethod
+    def source_key(path: str) -> str:
+        return str(Path(path).resolve())
+
+    def _lookup(self, source_paths: List[str]) -> Dict[str, Any]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                text(f"SELECT * FROM {DOCUMENT_REGISTRY_TABLE} WHERE collection_name = :coll AND source_path = ANY(:paths)"),
+                {"coll": self.collection_name, "paths": source_paths}
+            ).fetchall()
+        return {row.source_path: row for row in rows}
+
+    def classify(self, paths: List[str]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Splits existing `paths` into (changed, unchanged) entries. Each entry holds
+        the fingerprint to record plus `previous_document_id` when the source was
+        ingested before (its stale chunks must be removed first).
+        """
+        existing = [p for p in paths if os.path.exists(p)]
+        known = self._lookup([self.source_key(p) for p in existing]) if existing else {}
+        changed, unchanged = [], []
+        for path in existing:
+            key = self.source_key(path)
+            stat = os.stat(path)
+            previous = known.get(key)
+            entry = {
+                "path": path, "source_path": key, "document_id": Path(path).name,
+                "file_size": stat.st_size, "mtime": stat.st_mtime, "content_hash": None,
+                "previous_document_id": previous.document_id if previous is not None else None,
+            }
+            same_settings = (previous is not None and previous.parser_version == self.parser_version
+                             and previous.chunking_config == self.chunking_config)
+            if same_settings and previous.file_size == stat.st_size and previous.mtime == stat.st_mtime:
+                entry["content_hash"] = previous.content_hash
+                unchanged.append(entry)
+                continue
+            entry["content_hash"] = file_sha256(path)
+            if same_settings and previous.content_hash == entry["content_hash"]:
+                unchanged.append(entry)
+            else:
+                changed.append(entry)
+        return changed, unchanged
+
+    def record(self, entries: List[Dict[str, Any]]):
+        if not entries:
+            return
+        with self.engine.begin() as conn:
+            conn.execute(text(f"""
+                INSERT INTO {DOCUMENT_REGISTRY_TABLE}
+                    (collection_name, source_path, document_id, content_hash, file_size, mtime, parser_version, chunking_config, ingested_at)
+                VALUES (:coll, :source_path, :document_id, :content_hash, :file_size, :mtime, :parser_version, :chunking_config, CURRENT_TIMESTAMP)
+                ON CONFLICT (collection_name, source_path) DO UPDATE SET
+                    document_id = EXCLUDED.document_id, content_hash = EXCLUDED.content_hash,
+                    file_size = EXCLUDED.file_size, mtime = EXCLUDED.mtime,
+                    parser_version = EXCLUDED.parser_version, chunking_config = EXCLUDED.chunking_config,
+                    ingested_at = CURRENT_TIMESTAMP
+            """), [
+                {"coll": self.collection_name, "parser_version": self.parser_version,
+                 "chunking_config": self.chunking_config, **{k: e[k] for k in ("source_path", "document_id", "content_hash", "file_size", "mtime")}}
+                for e in entries
+            ])
+
+    def forget_document(self, conn, document_id: str):
+        """Removes a document's registry rows within the caller's transaction."""
+        conn.execute(
+            text(f"DELETE FROM {DOCUMENT_REGISTRY_TABLE} WHERE collection_name = :coll AND document_id = :doc_id"),
+            {"coll": self.collection_name, "doc_id": document_id}
+        )
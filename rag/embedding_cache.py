@@ -0,0 +1,178 @@
+"""
+Caching of query embeddings in front of the embedding endpoint.
+"""
+import asyncio
+import hashlib
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from sqlalchemy import text
+
+from .cache import LRUCache
+
+EMBEDDING_CACHE_TABLE = "embedding_cache"
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def init_embedding_cache_table(conn):
+    """Creates the persistent embedding cache table (shared by every embedding consumer)."""
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {EMBEDDING_CACHE_TABLE} (
+            deployment TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            embedding FLOAT4[] NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (deployment, content_hash)
+        )
+    """))
+
+
+class QueryEmbeddingCache:
+    """
+    Caches query embeddings keyed by (embedding deployment, normalized query text)
+    in a bounded in-process LRU with TTL; only misses call `embeddings`. The
+    persistent tier is `CachedEmbeddings`, which `embeddings` may be.
+
+    Normalization only widens cache hits: the raw query is what gets embedded,
+    as without the cache, and queries that differ only in width or whitespace
+    share the first one's vector.
+    """
+
+    def __init__(self, embeddings, deployment: str, text_processor, max_entries: int = 2048,
+                 ttl_seconds: Optional[float] = 3600):
+        self.embeddings = embeddings
+        self.deployment = deployment or ""
+        self.text_processor = text_processor
+        self.memory = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    def _key(self, query: str) -> str:
+        return content_hash(f"{self.deployment}\x00{self.text_processor.normalize_text(query)}")
+
+    def embed_query(self, query: str) -> List[float]:
+        key = self._key(query)
+        embedding = self.memory.get(key)
+        if embedding is None:
+            embedding = self.embeddings.embed_query(query)
+            self.memory.put(key, embedding)
+        return embedding
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embeds several queries with one `embed_documents` call for the misses."""
+        keys = [self._key(q) for q in queries]
+        found: Dict[str, List[float]] = {}
+        for key in keys:
+            embedding = self.memory.get(key)
+            if embedding is not None:
+                found[key] = embedding
+
+        to_embed: Dict[str, str] = {}
+        for key, query in zip(keys, queries):
+            if key not in found:
+                to_embed.setdefault(key, query)
+        if to_embed:
+            embeddings = self.embeddings.embed_documents(list(to_embed.values()))
+            for key, embedding in zip(to_embed.keys(), embeddings):
+                found[key] = embedding
+                self.memory.put(key, embedding)
+        return [found[key] for key in keys]
+
+    async def aembed_query(self, query: str) -> List[float]:
+        key = self._key(query)
+        embedding = self.memory.get(key)
+        if embedding is None:
+            embedding = await self.embeddings.aembed_query(query)
+            self.memory.put(key, embedding)
+        return embedding
+
+    def clear(self):
+        self.memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.memory.stats()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    `Embeddings` wrapper that reads and writes the persistent `embedding_cache`
+    table, keyed by (deployment, SHA-256 of the embedded text).
+
+    Each call looks all distinct texts up in one query and sends only the misses
+    to the wrapped model, in one `embed_documents` call; duplicates within a call
+    are embedded once. Query and document embeddings share entries, since the
+    deployment returns the same vector for both. Database errors fall back to
+    the wrapped model.
+    """
+
+    def __init__(self, embeddings: Embeddings, deployment: str, engine):
+        self.embeddings = embeddings
+        self.deployment = deployment or ""
+        self.engine = engine
+        self.hits = 0
+        self.misses = 0
+
+    def get_cached(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Cached vectors for `texts` in order, None where missing."""
+        keys = [content_hash(t) for t in texts]
+        distinct = list(dict.fromkeys(keys))
+        found: Dict[str, List[float]] = {}
+        if distinct:
+            try:
+                with self.engine.connect() as conn:
+                    rows = conn.execute(
+                        text(f"SELECT content_hash, embedding FROM {EMBEDDING_CACHE_TABLE} WHERE deployment = :deployment AND content_hash = ANY(:hashes)"),
+                        {"deployment": self.deployment, "hashes": distinct}
+                    ).fetchall()
+                found = {row.content_hash: list(row.embedding) for row in rows}
+            except Exception as e:
+                print(f"[CachedEmbeddings] lookup error: {e}")
+        self.hits += sum(1 for key in keys if key in found)
+        self.misses += sum(1 for key in keys if key not in found)
+        return [found.get(key) for key in keys]
+
+    def put_cached(self, texts: List[str], vectors: List[List[float]]):
+        items = {content_hash(t): v for t, v in zip(texts, vectors)}
+        if not items:
+            return
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(
+                    text(f"""
+                        INSERT INTO {EMBEDDING_CACHE_TABLE} (deployment, content_hash, embedding)
+                        VALUES (:deployment, :hash, :embedding)
+                        ON CONFLICT (deployment, content_hash) DO NOTHING
+                    """),
+                    [{"deployment": self.deployment, "hash": key, "embedding": list(v)} for key, v in items.items()]
+                )
+        except Exception as e:
+            print(f"[CachedEmbeddings] store error: {e}")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.get_cached(texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            fresh = dict(zip(missing, self.embeddings.embed_documents(missing)))
+            self.put_cached(list(fresh), list(fresh.values()))
+            vectors = [v if v is not None else fresh[t] for t, v in zip(texts, vectors)]
+        return vectors
+
+    def embed_query(self, text_: str) -> List[float]:
+        return self.embed_documents([text_])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = await asyncio.to_thread(self.get_cached, texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            fresh = dict(zip(missing, await self.embeddings.aembed_documents(missing)))
+            await asyncio.to_thread(self.put_cached, list(fresh), list(fresh.values()))
+            vectors = [v if v is not None else fresh[t] for t, v in zip(texts, vectors)]
+        return vectors
+
+    async def aembed_query(self, text_: str) -> List[float]:
+        return (await self.aembed_documents([text_]))[0]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": (self.hits / lookups) if lookups else 0.0}
@@ -0,0 +1,121 @@
+"""
+Concurrent, quota-aware embedding of ingestion chunks.
+
+Chunks are packed into embedding requests by token count, the requests run on
+a thread pool under a shared requests-per-minute pacer and tokens-per-minute
+bucket matched to the Azure deployment's quota, and rate limits and transient
+errors are retried with jittered backoff. The vectors are written with
+`vector_store.add_embeddings`, so the store does not embed the texts again.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Sequence
+
+import openai
+import tiktoken
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from .embedding_cache import CachedEmbeddings
+from .rate_limit import RETRYABLE_ERRORS, RequestPacer, TokenBucket, backoff_delay
+
+
+class EmbeddingWriter:
+    def __init__(self, vector_store, embeddings, *, client: Embeddings = None, concurrency: int = 4, tokens_per_minute: int = 0,
+                 requests_per_minute: int = 0, max_tokens_per_request: int = 16000,
+                 max_texts_per_request: int = 256, max_retries: int = 5, max_backoff: float = 30,
+                 encoding_name: str = "cl100k_base"):
+        self.vector_store = vector_store
+        self.embeddings = embeddings
+        # Requests bypass the cache wrapper; embed_texts consults it once per batch. `client`
+        # should have SDK retries disabled, or every retry here stacks on the SDK's own
+        if client is None:
+            client = embeddings.embeddings if isinstance(embeddings, CachedEmbeddings) else embeddings
+        self.client = client
+        self.concurrency = max(1, concurrency)
+        self.max_tokens_per_request = max(1, max_tokens_per_request)
+        self.max_texts_per_request = max(1, max_texts_per_request)
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.encoding = tiktoken.get_encoding(encoding_name)
+        self.pacer = RequestPacer(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def pack(self, token_counts: Sequence[int]) -> List[List[int]]:
+        """Groups text indices, in order, into requests under the token and text limits."""
+        requests: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+        for i, n_tokens in enumerate(token_counts):
+            if current and (current_tokens + n_tokens > self.max_tokens_per_request
+                            or len(current) >= self.max_texts_per_request):
+                requests.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += n_tokens
+        if current:
+            requests.append(current)
+        return requests
+
+    def _embed_request(self, texts: List[str], n_tokens: int) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            self.tokens.acquire(n_tokens)
+            self.pacer.wait()
+            try:
+                return self.client.embed_documents(texts)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = backoff_delay(e, attempt, self.max_backoff)
+                if isinstance(e, openai.RateLimitError):
+                    self.pacer.pause(delay)
+                print(f"[EmbeddingWriter] {type(e).__name__}, retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds `texts` with packed, concurrent requests; returns vectors in input order.
+        With `CachedEmbeddings`, cached texts are served from the cache and only the
+        distinct misses are sent (and counted against the quota).
+        """
+        if not isinstance(self.embeddings, CachedEmbeddings):
+            return self._embed_uncached(texts)
+        vectors = self.embeddings.get_cached(texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            fresh = dict(zip(missing, self._embed_uncached(missing)))
+            self.embeddings.put_cached(missing, [fresh[t] for t in missing])
+            vectors = [v if v is not None else fresh[t] for t, v in zip(texts, vectors)]
+        else:
+            print(f"All {len(texts)} chunk embeddings served from the embedding cache.")
+        return vectors
+
+    def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        token_counts = [len(tokens) for tokens in self.encoding.encode_batch(texts, disallowed_special=())]
+        requests = self.pack(token_counts)
+        vectors: List[List[float]] = [None] * len(texts)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(requests)) or 1,
+                                thread_name_prefix="embedding-writer") as executor:
+            futures = {
+                executor.submit(self._embed_request, [texts[i] for i in request], sum(token_counts[i] for i in request)): request
+                for request in requests
+            }
+            for future, request in futures.items():
+                for i, vector in zip(request, future.result()):
+                    vectors[i] = vector
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        print(f"Embedded {len(texts)} chunks ({sum(token_counts)} tokens) in {len(requests)} requests, "
+              f"{elapsed:.2f}s ({len(texts) / elapsed:.0f} chunks/s, {sum(token_counts) / elapsed:.0f} tokens/s).")
+        return vectors
+
+    def write(self, chunks: List[Document]):
+        """Embeds `chunks` and adds them to the vector store under their `chunk_id`."""
+        if not chunks:
+            return
+        texts = [c.page_content for c in chunks]
+        vectors = self.embed_texts(texts)
+        self.vector_store.add_embeddings(
+            texts=texts, embeddings=vectors,
+            metadatas=[c.metadata for c in chunks], ids=[c.metadata["chunk_id"] for c in chunks]
+        )
@@ -0,0 +1,330 @@
+"""
+CPU-bound file loading, runnable in worker processes.
+
+`load_file_elements` turns one source file into picklable elements without
+touching any LLM or database client. `iter_load_files` runs it for many files
+in parallel, one child process per file (or per page range of a large PDF) and
+at most `max_workers` at a time, and yields each file (or each page range, in
+page order) as soon as it is ready. A file that raises, crashes its process
+(e.g. a corrupt PDF in PyMuPDF) or exceeds `timeout` is reported as an error
+for that file only; the child is killed and the batch continues.
+"""
+import hashlib
+import io
+import multiprocessing
+import os
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import wait
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import fitz  # PyMuPDF
+
+TEXT_SUFFIXES = {".txt", ".md"}
+
+
+@dataclass(frozen=True)
+class ImageFilter:
+    """
+    Which extracted images are kept. Repeats of an image already seen in the
+    document (same xref or same bytes) are dropped when `dedupe` is set, as are
+    images smaller than `min_side` pixels on either side and near-uniform images
+    whose grayscale histogram entropy is below `min_entropy` bits. Entropy only
+    sees the tone distribution, not structure: a black-on-white diagram or chart
+    is mostly one tone and scores about as low as a blank spacer, so any cutoff
+    trades dropped line art against summarized decoration.
+    """
+    dedupe: bool = True
+    min_side: int = 0
+    min_entropy: float = 0.0
+
+
+def _image_entropy(image_bytes: bytes) -> Optional[float]:
+    try:
+        from PIL import Image
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            return image.convert("L").entropy()
+    except Exception:
+        return None
+
+
+def _is_decorative(base_image: Dict[str, Any], image_filter: ImageFilter) -> bool:
+    if image_filter.min_side and min(base_image.get("width", 0), base_image.get("height", 0)) < image_filter.min_side:
+        return True
+    if image_filter.min_entropy:
+        entropy = _image_entropy(base_image["image"])
+        return entropy is not None and entropy < image_filter.min_entropy
+    return False
+
+
+def iter_pdf_pages(file_path: str, image_output_dir: str, start_page: int = 0,
+                   end_page: Optional[int] = None, image_filter: Optional[ImageFilter] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Streams a PDF page by page over [start_page, end_page), yielding
+    {"page_number", "texts", "images", "tables"} for each page, so only one
+    page's elements are held at a time. Element lists are as in `parse_pdf_file`;
+    images are filtered by `image_filter` before anything is written to disk.
+    """
+    image_filter = image_filter or ImageFilter()
+    doc = fitz.open(file_path)
+    try:
+        base_filename = os.path.splitext(os.path.basename(file_path))[0]
+        end = doc.page_count if end_page is None else min(end_page, doc.page_count)
+        seen_xrefs: Set[int] = set()
+        seen_hashes: Set[str] = set()
+
+        for page_num in range(start_page, end):
+            page = doc[page_num]
+            page_elements = {"page_number": page_num + 1, "texts": [], "images": [], "tables": []}
+
+            # 1. Extract text blocks, sorted top-to-bottom, left-to-right so coalesced spans follow reading order
+            text_blocks = page.get_text("blocks", sort=True)
+            for i, block in enumerate(text_blocks):
+                text = block[4]
+                # Image blocks only carry a "<image: ...>" placeholder; images are extracted below
+                if block[6] != 0 or not text.strip():
+                    continue
+                metadata = {
+                    "source": file_path,
+                    "page_number": page_num + 1,
+                    "type": "text",
+                    "block_number": i
+                }
+                page_elements["texts"].append((text, metadata))
+
+            # 2. Extract images
+            image_list = page.get_images(full=True)
+            for img_index, img in enumerate(image_list):
+                xref = img[0]
+                if image_filter.dedupe:
+                    if xref in seen_xrefs:
+                        continue
+                    seen_xrefs.add(xref)
+                base_image = doc.extract_image(xref)
+                image_bytes = base_image["image"]
+                image_digest = hashlib.sha256(image_bytes).hexdigest()
+                if image_filter.dedupe:
+                    if image_digest in seen_hashes:
+                        continue
+                    seen_hashes.add(image_digest)
+                if _is_decorative(base_image, image_filter):
+                    continue
+
+                image_filename = f"{base_filename}_p{page_num+1}_img{img_index}.png"
+                image_path = os.path.join(image_output_dir, image_filename)
+
+                with open(image_path, "wb") as img_file:
+                    img_file.write(image_bytes)
+
+                metadata = {
+                    "source": file_path,
+                    "page_number": page_num + 1,
+                    "type": "image",
+                    "image_path": image_path,
+                    "image_hash": image_digest
+                }
+                page_elements["images"].append((image_path, metadata))
+
+            # 3. Extract tables
+            tabs = page.find_tables()
+            for i, tab in enumerate(tabs):
+                # This gives a list of lists (rows and cells)
+                table_data = tab.extract()
+                metadata = {
+                    "source": file_path,
+                    "page_number": page_num + 1,
+                    "type": "table",
+                    "table_number": i
+                }
+                page_elements["tables"].append((table_data, metadata))
+
+            yield page_elements
+    finally:
+        doc.close()
+
+
+def parse_pdf_file(file_path: str, image_output_dir: str, start_page: int = 0,
+                   end_page: Optional[int] = None, image_filter: Optional[ImageFilter] = None) -> Dict[str, List[Any]]:
+    """
+    Parses a PDF file (or the page range [start_page, end_page)) to extract text, images, and tables.
+
+    Returns:
+        A dictionary containing lists of extracted elements:
+        - "texts": List of (text_content, metadata)
+        - "images": List of (image_path, metadata)
+        - "tables": List of (table_data, metadata)
+    """
+    extracted_elements = {
+        "texts": [],
+        "images": [],
+        "tables": []
+    }
+    for page_elements in iter_pdf_pages(file_path, image_output_dir, start_page, end_page, image_filter):
+        for key, elements in extracted_elements.items():
+            elements.extend(page_elements[key])
+    return extracted_elements
+
+
+def pdf_page_count(file_path: str) -> int:
+    with fitz.open(file_path) as doc:
+        return doc.page_count
+
+
+def load_file_elements(file_path: str, image_output_dir: str, page_range: Optional[Tuple[int, int]] = None,
+                       image_filter: Optional[ImageFilter] = None) -> Dict[str, Any]:
+    """
+    Loads one file. PDFs return {"kind": "pdf", "page_count", "texts", "images", "tables"},
+    limited to `page_range` if given; other supported types return
+    {"kind": "documents", "documents": [Document, ...]}.
+    """
+    suf = Path(file_path).suffix.lower()
+    if suf == ".pdf":
+        start_page, end_page = page_range or (0, None)
+        return {"kind": "pdf", "page_count": pdf_page_count(file_path),
+                **parse_pdf_file(file_path, image_output_dir, start_page, end_page, image_filter)}
+
+    from langchain_community.document_loaders import TextLoader, Docx2txtLoader
+    if suf in TEXT_SUFFIXES:
+        return {"kind": "documents", "documents": TextLoader(file_path, encoding="utf-8").load()}
+    if suf == ".docx":
+        return {"kind": "documents", "documents": Docx2txtLoader(file_path).load()}
+    if suf == ".doc":
+        try:
+            from langchain_community.document_loaders import TextractLoader
+        except ImportError:
+            TextractLoader = None
+        if TextractLoader:
+            return {"kind": "documents", "documents": TextractLoader(file_path).load()}
+    return {"kind": "documents", "documents": []}
+
+
+def _worker(file_path: str, image_output_dir: str, page_range: Optional[Tuple[int, int]],
+            image_filter: Optional[ImageFilter], conn):
+    try:
+        conn.send(("ok", load_file_elements(file_path, image_output_dir, page_range, image_filter)))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__} - {e}"))
+    finally:
+        conn.close()
+
+
+def _mp_context():
+    methods = multiprocessing.get_all_start_methods()
+    if "forkserver" in methods:
+        ctx = multiprocessing.get_context("forkserver")
+        # Children fork from a server that has already imported PyMuPDF
+        ctx.set_forkserver_preload(["rag.file_loader"])
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+
+def _drop_repeated_images(elements: Dict[str, Any], seen_hashes: Set[str]) -> Dict[str, Any]:
+    """Removes images already yielded by an earlier shard of the same file (each worker only dedupes its own range)."""
+    images = []
+    for image_path, metadata in elements["images"]:
+        if metadata.get("image_hash") in seen_hashes:
+            continue
+        seen_hashes.add(metadata.get("image_hash"))
+        images.append((image_path, metadata))
+    return {**elements, "images": images}
+
+
+def iter_load_files(paths: List[str], image_output_dir: str, max_workers: int, timeout: Optional[float] = None,
+                    shard_pages: int = 0, image_filter: Optional[ImageFilter] = None
+                    ) -> Iterator[Tuple[str, Optional[Dict[str, Any]], Optional[str], bool]]:
+    """
+    Yields (path, elements, error, last) as files are parsed; exactly one of
+    elements/error is None, and `last` marks a file's final item. Files are
+    yielded in completion order. With `shard_pages`, PDFs are parsed in page
+    ranges of that size: the first shard reports the page count and the
+    remaining shards are scheduled ahead of other files, each in its own worker
+    that opens the file independently. Shards are yielded one by one in page
+    order as soon as the preceding ones are out, so a file is never merged in
+    memory. A failed shard ends the file with an error item after the shards
+    already yielded.
+    """
+    ctx = _mp_context()
+    dedupe_images = (image_filter or ImageFilter()).dedupe
+    pending: List[Tuple[str, Optional[Tuple[int, int]]]] = []
+    for path in paths:
+        is_pdf = Path(path).suffix.lower() == ".pdf"
+        pending.append((path, (0, shard_pages) if shard_pages and is_pdf else None))
+    running: Dict[Any, Tuple[str, Optional[Tuple[int, int]], Any, float]] = {}
+    shards: Dict[str, Dict[int, Dict[str, Any]]] = {} # finished shards waiting for an earlier one
+    next_start: Dict[str, int] = {}
+    seen_images: Dict[str, Set[str]] = {}
+    outstanding: Dict[str, int] = {}
+    errors: Dict[str, str] = {}
+
+    def finish(path: str, page_range, elements, error) -> List[Tuple[str, Optional[Dict[str, Any]], Optional[str], bool]]:
+        """Records one task's outcome; returns the items it makes ready, in page order."""
+        if page_range is None:
+            return [(path, elements, error, True)]
+        outstanding[path] = outstanding.get(path, 1) - 1
+        if error is not None:
+            errors.setdefault(path, error)
+            remaining = [task for task in pending if task[0] != path]
+            outstanding[path] -= len(pending) - len(remaining)
+            pending[:] = remaining
+        elif path not in errors:
+            start, end = page_range
+            shards.setdefault(path, {})[start] = elements
+            if start == 0:
+                extra = [(path, (s, s + shard_pages)) for s in range(end, elements["page_count"], shard_pages)]
+                outstanding[path] += len(extra)
+                pending[:0] = extra
+
+        ready = []
+        file_shards = shards.get(path, {})
+        while path not in errors and next_start.get(path, 0) in file_shards:
+            start = next_start.get(path, 0)
+            elements = file_shards.pop(start)
+            if dedupe_images:
+                elements = _drop_repeated_images(elements, seen_images.setdefault(path, set()))
+            next_start[path] = start + shard_pages
+            ready.append((path, elements, None, next_start[path] >= elements["page_count"]))
+        if outstanding[path] > 0:
+            return ready
+        for state in (outstanding, shards, next_start, seen_images):
+            state.pop(path, None)
+        if path in errors:
+            ready.append((path, None, errors.pop(path), True))
+        return ready
+
+    try:
+        while pending or running:
+            while pending and len(running) < max_workers:
+                path, page_range = pending.pop(0)
+                parent_conn, child_conn = ctx.Pipe(duplex=False)
+                process = ctx.Process(target=_worker, args=(path, image_output_dir, page_range, image_filter, child_conn), daemon=True)
+                process.start()
+                child_conn.close()
+                running[parent_conn] = (path, page_range, process, time.monotonic())
+
+            for conn in wait(list(running), timeout=0.5):
+                path, page_range, process, _ = running.pop(conn)
+                try:
+                    status, payload = conn.recv()
+                except EOFError:
+                    process.join()
+                    status, payload = "error", f"worker exited with code {process.exitcode}"
+                finally:
+                    conn.close()
+                process.join()
+                yield from finish(path, page_range, payload if status == "ok" else None, payload if status != "ok" else None)
+
+            if timeout:
+                now = time.monotonic()
+                for conn, (path, page_range, process, started) in list(running.items()):
+                    if now - started > timeout:
+                        running.pop(conn)
+                        process.kill()
+                        process.join()
+                        conn.close()
+                        yield from finish(path, page_range, None, f"timed out after {timeout:.0f}s")
+    finally:
+        for conn, (_, _, process, _) in running.items():
+            process.kill()
+            process.join()
+            conn.close()
@@ -0,0 +1,87 @@
+"""
+Persistent cache of image summaries, keyed by image content.
+
+Extracted images are written under page-position file names, so the key is the
+SHA-256 of the image bytes plus the chat deployment and the summary prompt
+version: identical figures across pages or documents, and every image of a
+re-ingested file, are summarized by the vision model only once.
+"""
+import hashlib
+from typing import Dict, List
+
+from sqlalchemy import text
+
+IMAGE_SUMMARY_CACHE_TABLE = "image_summary_cache"
+
+
+def image_hash(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def init_image_summary_cache_table(conn):
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {IMAGE_SUMMARY_CACHE_TABLE} (
+            deployment TEXT NOT NULL,
+            prompt_version TEXT NOT NULL,
+            image_hash TEXT NOT NULL,
+            summary TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (deployment, prompt_version, image_hash)
+        )
+    """))
+
+
+class ImageSummaryCache:
+    def __init__(self, engine, deployment: str, prompt_version: str):
+        self.engine = engine
+        self.deployment = deployment or ""
+        self.prompt_version = prompt_version
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, hashes: List[str]) -> Dict[str, str]:
+        if not hashes:
+            return {}
+        try:
+            with self.engine.connect() as conn:
+                rows = conn.execute(
+                    text(f"""
+                        SELECT image_hash, summary FROM {IMAGE_SUMMARY_CACHE_TABLE}
+                        WHERE deployment = :deployment AND prompt_version = :prompt_version AND image_hash = ANY(:hashes)
+                    """),
+                    {"deployment": self.deployment, "prompt_version": self.prompt_version, "hashes": list(hashes)}
+                ).fetchall()
+        except Exception as e:
+            print(f"[ImageSummaryCache] lookup error: {e}")
+            return {}
+        found = {row.image_hash: row.summary for row in rows}
+        self.hits += len(found)
+        self.misses += len(set(hashes)) - len(found)
+        return found
+
+    def get(self, key: str):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, summaries: Dict[str, str]):
+        if not summaries:
+            return
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(
+                    text(f"""
+                        INSERT INTO {IMAGE_SUMMARY_CACHE_TABLE} (deployment, prompt_version, image_hash, summary)
+                        VALUES (:deployment, :prompt_version, :hash, :summary)
+                        ON CONFLICT (deployment, prompt_version, image_hash) DO UPDATE SET
+                            summary = EXCLUDED.summary, created_at = CURRENT_TIMESTAMP
+                    """),
+                    [{"deployment": self.deployment, "prompt_version": self.prompt_version, "hash": key, "summary": summary}
+                     for key, summary in summaries.items()]
+                )
+        except Exception as e:
+            print(f"[ImageSummaryCache] store error: {e}")
+
+    def put(self, key: str, summary: str):
+        self.put_many({key: summary})
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
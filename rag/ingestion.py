@@ -1,85 +1,417 @@
+import csv
+import hashlib
+import io
 import json
+import os
+import queue
+import threading
+import time
 from pathlib import Path
-from sqlalchemy import create_engine, text
-from typing import List
-
-from langchain_community.document_loaders import (
-    PyPDFLoader, TextLoader, Docx2txtLoader
-)
-try:
-    from langchain_community.document_loaders import TextractLoader
-except ImportError:
-    TextractLoader = None
+from sqlalchemy import text
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+from langchain_openai import AzureOpenAIEmbeddings
 from .document_parser import DocumentParser
+from .file_loader import load_file_elements, iter_load_files
+from .image_summary_cache import ImageSummaryCache
+from .embedding_writer import EmbeddingWriter
+from .document_registry import DocumentRegistry, chunking_config_signature
+from .db import get_engine
+from .result_cache import bump_collection_version
+
+UPSERT_CHUNK_SQL = """
+    INSERT INTO document_chunks(collection_name, document_id, chunk_id, content, tokenized_content, metadata, created_at)
+    VALUES(:coll_name, :doc_id, :cid, :cont, :tok_cont, :meta, CURRENT_TIMESTAMP)
+    ON CONFLICT(chunk_id) DO UPDATE SET
+        content = EXCLUDED.content, tokenized_content = EXCLUDED.tokenized_content,
+        metadata = EXCLUDED.metadata, document_id = EXCLUDED.document_id,
+        collection_name = EXCLUDED.collection_name, created_at = CURRENT_TIMESTAMP
+"""
+
+# Bulk path: COPY each batch into a transaction-scoped staging table, then one set-based upsert
+CHUNK_STAGING_TABLE = "document_chunks_staging"
+STAGING_COLUMNS = ("ord", "collection_name", "document_id", "chunk_id", "content", "tokenized_content", "metadata")
+
+CREATE_STAGING_SQL = f"""
+    CREATE TEMP TABLE IF NOT EXISTS {CHUNK_STAGING_TABLE} (
+        ord BIGINT, collection_name TEXT, document_id TEXT, chunk_id TEXT,
+        content TEXT, tokenized_content TEXT, metadata JSONB
+    ) ON COMMIT DROP
+"""
+
+COPY_STAGING_SQL = f"COPY {CHUNK_STAGING_TABLE} ({', '.join(STAGING_COLUMNS)}) FROM STDIN"
+
+# DISTINCT ON keeps the last row per chunk_id, since ON CONFLICT cannot touch a row twice
+MERGE_STAGING_SQL = f"""
+    INSERT INTO document_chunks(collection_name, document_id, chunk_id, content, tokenized_content, metadata, created_at)
+    SELECT DISTINCT ON (chunk_id) collection_name, document_id, chunk_id, content, tokenized_content, metadata, CURRENT_TIMESTAMP
+    FROM {CHUNK_STAGING_TABLE}
+    ORDER BY chunk_id, ord DESC
+    ON CONFLICT(chunk_id) DO UPDATE SET
+        content = EXCLUDED.content, tokenized_content = EXCLUDED.tokenized_content,
+        metadata = EXCLUDED.metadata, document_id = EXCLUDED.document_id,
+        collection_name = EXCLUDED.collection_name, created_at = CURRENT_TIMESTAMP
+"""
+
+def prefetch(iterator: Iterator[Any], maxsize: int) -> Iterator[Any]:
+    """
+    Runs `iterator` in a background thread and yields its items through a queue
+    of at most `maxsize` items, so the producer runs ahead of the consumer by a
+    bounded amount. Producer exceptions are re-raised in the consumer; closing
+    this generator stops the producer and closes `iterator`.
+    """
+    items: "queue.Queue" = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterator:
+                if not put((None, item)):
+                    break
+            else:
+                put((None, done))
+        except BaseException as e:
+            put((e, None))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+
+    producer = threading.Thread(target=produce, name="ingestion-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            error, item = items.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+def coalesce_text_blocks(texts: List[Tuple[str, Dict[str, Any]]], max_chars: int = 0) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Merges consecutive text blocks of the same page, in extraction (reading)
+    order, into spans of at most `max_chars` characters (0 = no limit; a single
+    longer block stays whole). Each span keeps the page number and lists the
+    merged blocks in `block_numbers`.
+    """
+    spans: List[Tuple[str, Dict[str, Any]]] = []
+    parts: List[str] = []
+    span_meta: Dict[str, Any] = {}
+    length = 0
+
+    def flush():
+        if parts:
+            spans.append(("\n\n".join(parts), span_meta))
+
+    for text, metadata in texts:
+        text = text.strip()
+        if not text:
+            continue
+        same_page = parts and metadata.get("page_number") == span_meta.get("page_number") \
+            and metadata.get("source") == span_meta.get("source")
+        if not same_page or (max_chars and length + len(text) + 2 > max_chars):
+            flush()
+            parts, length = [], 0
+            span_meta = {k: v for k, v in metadata.items() if k != "block_number"}
+            span_meta["block_numbers"] = []
+        parts.append(text)
+        length += len(text) + 2
+        if "block_number" in metadata:
+            span_meta["block_numbers"].append(metadata["block_number"])
+    flush()
+    return spans
+
 
 class IngestionHandler:
-    def __init__(self, config, vector_store, text_processor, connection_string):
+    def __init__(self, config, vector_store, text_processor, connection_string, engine=None):
         self.config = config
         self.vector_store = vector_store
         self.text_processor = text_processor
         self.connection_string = connection_string
-        self.parser = DocumentParser(config)
+        self.engine = engine or get_engine(connection_string)
+        summary_cache = None
+        if config.enable_image_summary_cache:
+            summary_cache = ImageSummaryCache(
+                self.engine, config.azure_openai_chat_deployment_name, DocumentParser.summary_cache_version(config)
+            )
+        self.parser = DocumentParser(config, summary_cache=summary_cache)
+        self.embedding_writer = None
+        if config.enable_concurrent_embedding and vector_store is not None:
+            self.embedding_writer = EmbeddingWriter(
+                vector_store, vector_store.embeddings,
+                client=AzureOpenAIEmbeddings(
+                    azure_endpoint=config.azure_openai_endpoint,
+                    api_key=config.azure_openai_api_key,
+                    api_version=config.azure_openai_api_version,
+                    azure_deployment=config.azure_openai_embedding_deployment_name,
+                    max_retries=0 # retries are paced by EmbeddingWriter
+                ),
+                concurrency=config.embedding_concurrency,
+                tokens_per_minute=config.embedding_tpm,
+                requests_per_minute=config.embedding_rpm,
+                max_tokens_per_request=config.embedding_max_tokens_per_request,
+                max_texts_per_request=config.embedding_max_texts_per_request,
+                max_retries=config.embedding_max_retries,
+                max_backoff=config.embedding_max_backoff,
+            )
+        self.registry = DocumentRegistry(
+            self.engine, config.collection_name, DocumentParser.PARSER_VERSION, chunking_config_signature(config)
+        )
+        self._change_listeners: List[Callable[[str], None]] = []
+        self._batch_listeners: List[Callable[[str], None]] = []
+        self._deferring_batch = False
+        self._batch_changed = False
+        self._version_listeners: List[Callable[[Optional[int]], None]] = []
+        self._stored_listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+        self._deleted_listeners: List[Callable[[List[str]], None]] = []
+
+    def add_change_listener(self, listener: Callable[[str], None]):
+        """Registers a callback invoked with the collection name after its contents change."""
+        self._change_listeners.append(listener)
+
+    def add_batch_listener(self, listener: Callable[[str], None]):
+        """
+        Registers a callback for expensive follow-up work (snapshots, index
+        builds), invoked with the collection name once at the end of an
+        `ingest_documents` run that changed the collection instead of after
+        every file. Changes outside a run (e.g. deletes) invoke it right away.
+        """
+        self._batch_listeners.append(listener)
+
+    def add_version_listener(self, listener: Callable[[Optional[int]], None]):
+        """
+        Registers a callback invoked, before the change listeners, with the
+        collection version produced by each of this process's own changes
+        (None if the bump failed, i.e. the DB version no longer describes them).
+        """
+        self._version_listeners.append(listener)
+
+    def add_chunk_listener(self, on_stored: Callable[[List[Dict[str, Any]]], None] = None,
+                           on_deleted: Callable[[List[str]], None] = None):
+        """
+        Registers chunk-level callbacks for in-process indexes and caches.
+        `on_stored` receives the parameter rows written to document_chunks
+        (keys: coll_name, doc_id, cid, cont, tok_cont, meta); `on_deleted`
+        receives removed chunk IDs.
+        """
+        if on_stored:
+            self._stored_listeners.append(on_stored)
+        if on_deleted:
+            self._deleted_listeners.append(on_deleted)
+
+    def _notify_chunks_stored(self, rows: List[Dict[str, Any]]):
+        for listener in self._stored_listeners:
+            try:
+                listener(rows)
+            except Exception as e:
+                print(f"Error in chunk listener: {type(e).__name__} - {e}")
+
+    def _notify_chunks_deleted(self, chunk_ids: List[str]):
+        for listener in self._deleted_listeners:
+            try:
+                listener(chunk_ids)
+            except Exception as e:
+                print(f"Error in chunk listener: {type(e).__name__} - {e}")
+
+    def _notify_collection_changed(self, conn=None) -> Optional[int]:
+        """
+        Bumps the collection version in the DB, so caches in every process see the
+        change, then notifies local listeners; returns the new version. When `conn`
+        is given the bump joins the caller's transaction: errors propagate so the
+        caller rolls back, and the caller must call `_notify_listeners(version)`
+        after it commits.
+        """
+        collection_name = self.config.collection_name
+        if conn is not None:
+            return bump_collection_version(conn, collection_name)
+        version = None
+        try:
+            with self.engine.begin() as new_conn:
+                version = bump_collection_version(new_conn, collection_name)
+        except Exception as e:
+            print(f"Error bumping collection version: {type(e).__name__} - {e}")
+        self._notify_listeners(version)
+        return version
+
+    def _notify_listeners(self, version: Optional[int] = None):
+        for listener in self._version_listeners:
+            listener(version)
+        for listener in self._change_listeners:
+            listener(self.config.collection_name)
+        if self._deferring_batch:
+            self._batch_changed = True
+        else:
+            self._notify_batch_listeners()
+
+    def _notify_batch_listeners(self):
+        for listener in self._batch_listeners:
+            try:
+                listener(self.config.collection_name)
+            except Exception as e:
+                print(f"Error in batch listener: {type(e).__name__} - {e}")
+
+    @staticmethod
+    def _report_image_progress(completed: int, total: int):
+        if completed == total or completed % 10 == 0:
+            print(f"  Summarized {completed}/{total} images")
+
+    def _documents_from_elements(self, elements: Dict[str, Any]) -> List[Document]:
+        """Turns loaded file elements into Documents; image summaries are generated here, in the main process."""
+        if elements["kind"] == "documents":
+            return list(elements["documents"])
 
-    def load_documents(self, paths: List[str]) -> List[Document]:
         docs: List[Document] = []
+        # 1. Process text elements
+        texts = elements["texts"]
+        if self.config.pdf_text_coalescing == "page":
+            texts = coalesce_text_blocks(texts, self.config.pdf_coalesce_max_chars)
+        for text, metadata in texts:
+            docs.append(Document(page_content=text, metadata=metadata))
+
+        # 2. Process image elements
+        if elements["images"]:
+            print(f"Found {len(elements['images'])} images. Summarizing...")
+        image_paths = [image_path for image_path, _ in elements["images"]]
+        summaries = self.parser.summarize_images(image_paths, progress=self._report_image_progress) if image_paths else []
+        for (image_path, metadata), summary in zip(elements["images"], summaries):
+            summary_metadata = metadata.copy()
+            summary_metadata["type"] = "image_summary"
+            summary_metadata["original_image_path"] = image_path
+            docs.append(Document(page_content=summary, metadata=summary_metadata))
+
+        # 3. Process table elements
+        if elements["tables"]:
+            print(f"Found {len(elements['tables'])} tables. Converting to Markdown...")
+        for table_data, metadata in elements["tables"]:
+            markdown_table = self.parser.format_table_as_markdown(table_data)
+            if markdown_table:
+                table_metadata = metadata.copy()
+                table_metadata["type"] = "table"
+                docs.append(Document(page_content=markdown_table, metadata=table_metadata))
+        return docs
+
+    def iter_pdf_documents(self, path: str) -> Iterator[List[Document]]:
+        """
+        Streams a PDF as Document batches of `pdf_shard_pages` pages (one batch
+        for the whole file when 0), the same page ranges the worker processes
+        parse, so chunking and storing start before the whole file is parsed and
+        only one batch is held at a time.
+        """
+        batch_pages = self.config.pdf_shard_pages
+        batch: Dict[str, Any] = {"kind": "pdf", "texts": [], "images": [], "tables": []}
+        pages = 0
+        for page_elements in self.parser.iter_parse_pdf(path):
+            for key in ("texts", "images", "tables"):
+                batch[key].extend(page_elements[key])
+            pages += 1
+            if batch_pages and pages == batch_pages:
+                yield self._documents_from_elements(batch)
+                batch = {"kind": "pdf", "texts": [], "images": [], "tables": []}
+                pages = 0
+        if pages:
+            yield self._documents_from_elements(batch)
+
+    def _ingestion_workers(self, paths: List[str]) -> int:
+        workers = self.config.ingestion_workers or (os.cpu_count() or 1)
+        if self.config.pdf_shard_pages and any(Path(p).suffix.lower() == ".pdf" for p in paths):
+            # Page ranges of a single large PDF can keep the whole pool busy
+            return max(1, workers)
+        return max(1, min(workers, len(paths)))
+
+    def iter_loaded_files(self, paths: List[str]) -> Iterator[Tuple[str, Optional[List[Document]], bool]]:
+        """
+        Yields (path, documents, last) per loaded batch: a whole file, or one
+        page range of a PDF in page order, with `last` set on a file's final
+        item. Parsing runs in a process pool when more than one worker is
+        configured. Files that fail, crash or time out are reported and end
+        with a (path, None, True) item, possibly after batches already yielded.
+        """
+        existing = []
         for p_str in paths:
-            path = Path(p_str)
-            if not path.exists():
+            if Path(p_str).exists():
+                existing.append(p_str)
+            else:
                 print(f"File not found: {p_str}")
+
+        workers = self._ingestion_workers(existing)
+        if workers <= 1:
+            for p_str in existing:
+                try:
+                    if Path(p_str).suffix.lower() == ".pdf":
+                        for docs in self.iter_pdf_documents(p_str):
+                            yield p_str, docs, False
+                        yield p_str, [], True
+                        continue
+                    yield p_str, self._documents_from_elements(load_file_elements(p_str, self.parser.image_output_dir)), True
+                except Exception as e:
+                    print(f"Error loading {p_str}: {type(e).__name__} - {e}")
+                    yield p_str, None, True
+            return
+
+        print(f"Loading {len(existing)} files with {workers} worker processes...")
+        timeout = self.config.ingestion_file_timeout or None
+        for p_str, elements, error, last in iter_load_files(existing, self.parser.image_output_dir, workers, timeout,
+                                                            shard_pages=self.config.pdf_shard_pages,
+                                                            image_filter=self.parser.image_filter):
+            if error is not None:
+                print(f"Error loading {p_str}: {error}")
+                yield p_str, None, True
                 continue
-            suf = path.suffix.lower()
             try:
-                if suf == ".pdf":
-                    # Use the new DocumentParser for PDFs
-                    parsed_elements = self.parser.parse_pdf(str(path))
-                    
-                    # 1. Process text elements
-                    for text, metadata in parsed_elements["texts"]:
-                        docs.append(Document(page_content=text, metadata=metadata))
-                    
-                    # 2. Process image elements
-                    print(f"Found {len(parsed_elements['images'])} images. Summarizing...")
-                    for image_path, metadata in parsed_elements["images"]:
-                        summary = self.parser.summarize_image(image_path)
-                        summary_metadata = metadata.copy()
-                        summary_metadata["type"] = "image_summary"
-                        summary_metadata["original_image_path"] = image_path
-                        docs.append(Document(page_content=summary, metadata=summary_metadata))
-
-                    # 3. Process table elements
-                    print(f"Found {len(parsed_elements['tables'])} tables. Converting to Markdown...")
-                    for table_data, metadata in parsed_elements["tables"]:
-                        markdown_table = self.parser.format_table_as_markdown(table_data)
-                        if markdown_table:
-                            table_metadata = metadata.copy()
-                            table_metadata["type"] = "table"
-                            docs.append(Document(page_content=markdown_table, metadata=table_metadata))
-
-                elif suf in {".txt", ".md"}:
-                    docs.extend(TextLoader(str(path), encoding="utf-8").load())
-                elif suf == ".docx":
-                    docs.extend(Docx2txtLoader(str(path)).load())
-                elif suf == ".doc" and TextractLoader:
-                    docs.extend(TextractLoader(str(path)).load())
+                yield p_str, self._documents_from_elements(elements), last
             except Exception as e:
                 print(f"Error loading {p_str}: {type(e).__name__} - {e}")
-        return docs
+                yield p_str, None, True
+
+    def load_documents(self, paths: List[str]) -> List[Document]:
+        # Files finish in any order; keep the input order so positional chunk IDs stay deterministic
+        loaded: Dict[str, List[Document]] = {}
+        failed = set()
+        for p_str, docs, _ in self.iter_loaded_files(paths):
+            if docs is None:
+                failed.add(p_str)
+            else:
+                loaded.setdefault(p_str, []).extend(docs)
+        return [doc for p_str in paths if p_str not in failed for doc in loaded.get(p_str, [])]
 
-    def chunk_documents(self, docs: List[Document]) -> List[Document]:
+    def chunk_documents(self, docs: List[Document], doc_offset: int = 0,
+                        seen_ids: Optional[Dict[str, int]] = None) -> List[Document]:
+        """
+        `doc_offset` and `seen_ids` continue the chunk IDs of earlier batches of
+        the same file, so a file chunked batch by batch gets the IDs it would get
+        in one call.
+        """
         if not self.config.enable_parent_child_chunking:
-            return self._chunk_documents_standard(docs)
+            return self._chunk_documents_standard(docs, doc_offset, seen_ids)
         else:
-            return self._chunk_documents_parent_child(docs)
+            return self._chunk_documents_parent_child(docs, doc_offset, seen_ids)
 
-    def _chunk_documents_standard(self, docs: List[Document]) -> List[Document]:
+    def _chunk_documents_standard(self, docs: List[Document], doc_offset: int = 0,
+                                  seen_ids: Optional[Dict[str, int]] = None) -> List[Document]:
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=self.config.chunk_size,
             chunk_overlap=self.config.chunk_overlap
         )
         all_chunks = []
-        for i, d in enumerate(docs):
+        seen_ids = {} if seen_ids is None else seen_ids
+        for i, d in enumerate(docs, doc_offset):
             src = d.metadata.get("source", f"doc_source_{i}")
             doc_id = Path(src).name
             try:
@@ -88,7 +420,7 @@ class IngestionHandler:
                 chunks = text_splitter.split_documents([d])
                 for j, chunk in enumerate(chunks):
                     chunk.metadata.update({
-                        "chunk_id": f"{doc_id}_{i}_{j}",
+                        "chunk_id": self._chunk_id(f"{doc_id}_{i}_{j}", f"{doc_id}_", doc_id, chunk.page_content, seen_ids),
                         "document_id": doc_id,
                         "original_document_source": src,
                         "collection_name": self.config.collection_name
@@ -98,7 +430,23 @@ class IngestionHandler:
                 print(f"Error in standard splitting for {src}: {e}")
         return all_chunks
 
-    def _chunk_documents_parent_child(self, docs: List[Document]) -> List[Document]:
+    def _chunk_id(self, positional_id: str, prefix: str, scope: str, content: str, seen_ids: Dict[str, int]) -> str:
+        """
+        Returns `positional_id`, or in content mode an ID derived from the chunk's
+        scope (document or parent ID) and normalized content, so unchanged chunks
+        keep their ID when a document is edited. Repeated content gets a suffix.
+        """
+        if self.config.chunk_id_mode != "content":
+            return positional_id
+        digest = hashlib.sha1(f"{scope}\x00{content}".encode("utf-8")).hexdigest()[:20]
+        base_id = f"{prefix}{digest}"
+        occurrence = seen_ids.get(base_id, 0)
+        seen_ids[base_id] = occurrence + 1
+        return base_id if occurrence == 0 else f"{base_id}_{occurrence}"
+
+    def _split_parent_child(self, docs: List[Document], doc_offset: int = 0,
+                            seen_ids: Optional[Dict[str, int]] = None) -> Tuple[List[Document], List[Document]]:
+        """Splits documents into parent chunks (keyword search and retrieval) and child chunks (vector search)."""
         parent_splitter = RecursiveCharacterTextSplitter(
             chunk_size=self.config.parent_chunk_size,
             chunk_overlap=self.config.parent_chunk_overlap
@@ -110,8 +458,9 @@ class IngestionHandler:
         
         all_chunks = []
         parent_chunks_for_db = []
+        seen_ids = {} if seen_ids is None else seen_ids
 
-        for i, doc in enumerate(docs):
+        for i, doc in enumerate(docs, doc_offset):
             src = doc.metadata.get("source", f"doc_source_{i}")
             doc_id = Path(src).name
             try:
@@ -121,7 +470,7 @@ class IngestionHandler:
                 parents = parent_splitter.split_documents([doc])
                 
                 for parent_idx, parent in enumerate(parents):
-                    parent_id = f"parent_{doc_id}_{i}_{parent_idx}"
+                    parent_id = self._chunk_id(f"parent_{doc_id}_{i}_{parent_idx}", f"parent_{doc_id}_", doc_id, parent.page_content, seen_ids)
                     parent.metadata.update({
                         "chunk_id": parent_id,
                         "document_id": doc_id,
@@ -133,7 +482,7 @@ class IngestionHandler:
 
                     child_docs = child_splitter.split_documents([parent])
                     for child_idx, child in enumerate(child_docs):
-                        child_id = f"child_{parent_id}_{child_idx}"
+                        child_id = self._chunk_id(f"child_{parent_id}_{child_idx}", f"child_{doc_id}_", parent_id, child.page_content, seen_ids)
                         child.metadata.update({
                             "chunk_id": child_id,
                             "document_id": doc_id,
@@ -145,7 +494,11 @@ class IngestionHandler:
                         all_chunks.append(child)
             except Exception as e:
                 print(f"Error in parent-child splitting for {src}: {e}")
-        
+        return parent_chunks_for_db, all_chunks
+
+    def _chunk_documents_parent_child(self, docs: List[Document], doc_offset: int = 0,
+                                      seen_ids: Optional[Dict[str, int]] = None) -> List[Document]:
+        parent_chunks_for_db, all_chunks = self._split_parent_child(docs, doc_offset, seen_ids)
         # We only store child chunks for vector search, but parents are also stored for keyword search and retrieval
         self._store_chunks_for_keyword_search(parent_chunks_for_db)
         return all_chunks
@@ -153,71 +506,291 @@ class IngestionHandler:
     def _store_chunks_for_keyword_search(self, chunks: List[Document]):
         if not chunks:
             return
-        eng = create_engine(self.connection_string)
-        sql = text("""
-            INSERT INTO document_chunks(collection_name, document_id, chunk_id, content, tokenized_content, metadata, created_at) 
-            VALUES(:coll_name, :doc_id, :cid, :cont, :tok_cont, :meta, CURRENT_TIMESTAMP) 
-            ON CONFLICT(chunk_id) DO UPDATE SET 
-                content = EXCLUDED.content, tokenized_content = EXCLUDED.tokenized_content,
-                metadata = EXCLUDED.metadata, document_id = EXCLUDED.document_id,
-                collection_name = EXCLUDED.collection_name, created_at = CURRENT_TIMESTAMP;
-        """)
+        rows = []
+        for c in chunks:
+            normalized_content = self.text_processor.normalize_text(c.page_content)
+            tokenized_content = self.text_processor.tokenize(normalized_content) if self.config.enable_japanese_search else ""
+            rows.append({
+                "coll_name": self.config.collection_name,
+                "doc_id": c.metadata["document_id"],
+                "cid": c.metadata["chunk_id"],
+                # Same text as the PGVector document, so every search engine returns identical Documents
+                "cont": c.page_content,
+                "tok_cont": " ".join(tokenized_content),
+                "meta": json.dumps(c.metadata or {})
+            })
+
+        batch_size = max(1, self.config.keyword_write_batch_size)
+        started = time.perf_counter()
+        # Errors propagate so the caller does not record a file whose keyword rows are missing
+        with self.engine.connect() as conn, conn.begin():
+            copy_rows = self._copy_writer(conn)
+            if copy_rows is not None:
+                conn.execute(text(CREATE_STAGING_SQL))
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                if copy_rows is None:
+                    conn.execute(text(UPSERT_CHUNK_SQL), batch)
+                    continue
+                copy_rows(start, batch)
+                conn.execute(text(MERGE_STAGING_SQL))
+                conn.execute(text(f"TRUNCATE {CHUNK_STAGING_TABLE}"))
+        elapsed = time.perf_counter() - started
+        print(f"Stored {len(rows)} chunks for keyword search in {elapsed:.2f}s ({len(rows) / max(elapsed, 1e-9):.0f} chunks/s).")
+        self._notify_chunks_stored(rows)
+
+    @staticmethod
+    def _copy_writer(conn):
+        """
+        Returns a function that COPYs a batch of rows into the staging table on
+        `conn`'s DBAPI connection, or None if the driver has no COPY support
+        (the caller then falls back to executemany batches).
+        """
+        driver = conn.dialect.driver
+        dbapi_conn = conn.connection.driver_connection
+
+        def staging_values(start, batch):
+            for i, row in enumerate(batch):
+                yield (start + i, row["coll_name"], row["doc_id"], row["cid"], row["cont"], row["tok_cont"], row["meta"])
+
+        if driver == "psycopg":
+            def copy_rows(start, batch):
+                with dbapi_conn.cursor() as cur, cur.copy(COPY_STAGING_SQL) as copy:
+                    for values in staging_values(start, batch):
+                        copy.write_row(values)
+            return copy_rows
+
+        if driver == "psycopg2":
+            def copy_rows(start, batch):
+                buf = io.StringIO()
+                # QUOTE_ALL keeps empty strings distinct from NULL in CSV COPY
+                csv.writer(buf, quoting=csv.QUOTE_ALL).writerows(staging_values(start, batch))
+                buf.seek(0)
+                with dbapi_conn.cursor() as cur:
+                    cur.copy_expert(f"{COPY_STAGING_SQL} WITH (FORMAT csv)", buf)
+            return copy_rows
+
+        return None
+
+    def _select_changed(self, paths: List[str]) -> List[Dict[str, Any]]:
+        """
+        Drops unchanged files. The stale chunks of changed ones are replaced from
+        `_begin_file` once the new version starts loading, so a file that fails to
+        load keeps its previous chunks.
+        """
+        changed, unchanged = self.registry.classify(paths)
+        if unchanged:
+            print(f"Skipping {len(unchanged)} unchanged documents.")
+            # Refresh mtimes so the next run can skip them without hashing
+            self.registry.record(unchanged)
+        return changed
+
+    def _store_chunk_batches(self, chunks: List[Document]):
+        """Embeds and stores chunks in micro-batches of `ingestion_batch_size`, so each batch is searchable once written."""
+        batch_size = max(1, self.config.ingestion_batch_size)
+        for start in range(0, len(chunks), batch_size):
+            batch = chunks[start:start + batch_size]
+            if self.embedding_writer is not None:
+                self.embedding_writer.write(batch)
+            else:
+                self.vector_store.add_documents(batch, ids=[c.metadata["chunk_id"] for c in batch])
+            self._store_chunks_for_keyword_search(batch)
+
+    def _begin_file(self, path: str, previous_document_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Starts ingesting one file once its first batch has loaded, and returns the
+        state `_ingest_batch` and `_finish_file` carry between its batches.
+        `previous_document_id` is the document this file replaces. Positional
+        chunk IDs repeat across versions, so in positional mode the chunks stored
+        under this file's document ID (and `previous_document_id`, if different)
+        are deleted here, before the new ones are written, whether or not the
+        registry knew the file (older documents, `force=True`); in content mode
+        the stored IDs are read instead and the chunk diff removes stale ones at the end.
+        """
+        state = {"path": path, "document_id": Path(path).name, "doc_offset": 0, "seen_ids": {},
+                 "existing_ids": set(), "new_ids": set(), "stored": 0, "ok": True}
         try:
-            with eng.connect() as conn, conn.begin():
-                for c in chunks:
-                    normalized_content = self.text_processor.normalize_text(c.page_content)
-                    tokenized_content = self.text_processor.tokenize(normalized_content) if self.config.enable_japanese_search else ""
-                    conn.execute(sql, {
-                        "coll_name": self.config.collection_name,
-                        "doc_id": c.metadata["document_id"],
-                        "cid": c.metadata["chunk_id"],
-                        "cont": normalized_content,
-                        "tok_cont": " ".join(tokenized_content),
-                        "meta": json.dumps(c.metadata or {})
-                    })
+            if self.config.chunk_id_mode == "content":
+                state["existing_ids"] = self._existing_chunk_ids([state["document_id"]])
+            else:
+                for doc_id in dict.fromkeys(filter(None, [state["document_id"], previous_document_id])):
+                    ok, message = self.delete_document_by_id(doc_id)
+                    print(f"Replacing stored chunks: {message}")
+                    if not ok:
+                        state["ok"] = False
+                        break
         except Exception as e:
-            print(f"Error storing chunks for keyword search: {type(e).__name__} - {e}")
-
-    def ingest_documents(self, paths: List[str]):
-        print("Loading documents...")
-        all_docs = self.load_documents(paths)
-        if not all_docs:
-            print("No documents loaded.")
-            return
+            print(f"Error preparing ingestion of {path}: {type(e).__name__} - {e}")
+            state["ok"] = False
+        return state
 
-        print(f"Chunking {len(all_docs)} documents...")
-        chunks = self.chunk_documents(all_docs)
-        
-        # In parent-child mode, `chunk_documents` returns only child chunks for vector search
-        # The parent chunks are already stored in `_chunk_documents_parent_child`
-        valid_chunks = [c for c in chunks if c.page_content and c.page_content.strip()]
-        
-        if not valid_chunks:
-            print("No valid chunks to ingest.")
+    def _ingest_batch(self, state: Dict[str, Any], docs: List[Document]):
+        """Chunks, embeds and stores one loaded batch of a file; a failure marks the file as failed."""
+        if not state["ok"] or not docs:
             return
-        
-        print(f"Ingesting {len(valid_chunks)} chunks...")
-        chunk_ids = [c.metadata['chunk_id'] for c in valid_chunks]
+        doc_offset = state["doc_offset"]
+        state["doc_offset"] += len(docs)
         try:
-            # Store child chunks for vector search
-            self.vector_store.add_documents(valid_chunks, ids=chunk_ids)
-            # Store child chunks for keyword search
-            self._store_chunks_for_keyword_search(valid_chunks)
-            print(f"Successfully ingested {len(valid_chunks)} chunks.")
+            if self.config.chunk_id_mode == "content":
+                self._store_chunk_diff(state, docs, doc_offset)
+                return
+            chunks = self.chunk_documents(docs, doc_offset, state["seen_ids"])
+            # In parent-child mode, `chunk_documents` returns only child chunks for vector search
+            # The parent chunks are already stored in `_chunk_documents_parent_child`
+            valid_chunks = [c for c in chunks if c.page_content and c.page_content.strip()]
+            self._store_chunk_batches(valid_chunks)
+            state["stored"] += len(valid_chunks)
         except Exception as e:
-            print(f"Error during ingestion: {type(e).__name__} - {e}")
+            print(f"Error during ingestion of {state['path']}: {type(e).__name__} - {e}")
+            state["ok"] = False
+
+    def _finish_file(self, state: Dict[str, Any]) -> bool:
+        """
+        Completes a file after its last batch. Returns True only when every batch
+        was stored (vector and keyword writes) and the file should be recorded.
+        """
+        path = state["path"]
+        if self.config.chunk_id_mode == "content":
+            if not state["ok"]:
+                return False # stale chunks stay until the file is ingested successfully
+            stale_ids = sorted(state["existing_ids"] - state["new_ids"])
+            unchanged = len(state["new_ids"] & state["existing_ids"])
+            print(f"Chunk diff for {path}: {state['stored']} new, {len(stale_ids)} removed, {unchanged} unchanged.")
+            try:
+                if stale_ids:
+                    self._delete_chunks(stale_ids)
+                return True
+            except Exception as e:
+                print(f"Error removing stale chunks of {path}: {type(e).__name__} - {e}")
+                return False
+
+        if not state["ok"]:
+            if state["doc_offset"]:
+                # Drop the partly stored version so the retry starts clean
+                ok, message = self.delete_document_by_id(state["document_id"])
+                print(f"Removing partly ingested document: {message}")
+            return False
+        if not state["stored"]:
+            print(f"No valid chunks to ingest from {path}.")
+            return False
+        print(f"Ingested {state['stored']} chunks from {path}.")
+        return True
+
+    def ingest_documents(self, paths: List[str], force: bool = False):
+        """
+        Streams files through load -> chunk -> embed -> store. Each file arrives
+        in batches (a PDF in page ranges of `pdf_shard_pages`), and each batch is
+        chunked and stored as it loads, so a large PDF never has to be held in
+        memory whole. Loading runs ahead in the background by at most
+        `ingestion_prefetch_files` batches. A file is recorded in the registry
+        and its version bumped once all its batches are stored; batch listeners
+        run once at the end.
+        """
+        registry_entries: List[Dict[str, Any]] = []
+        if self.config.enable_incremental_ingestion and not force:
+            try:
+                registry_entries = self._select_changed(paths)
+                missing = [p for p in paths if not Path(p).exists()]
+                paths = [e["path"] for e in registry_entries] + missing
+            except Exception as e:
+                print(f"Error checking document registry, ingesting all files: {type(e).__name__} - {e}")
+                registry_entries = []
+            if not paths:
+                print("All documents are unchanged; nothing to ingest.")
+                return
+        entries_by_path = {str(Path(e["path"])): e for e in registry_entries}
+
+        print(f"Loading {len(paths)} documents...")
+        started = time.perf_counter()
+        ingested = 0
+        # Batches of different files can interleave when workers parse in parallel
+        files: Dict[str, Dict[str, Any]] = {}
+        loaded_files = prefetch(self.iter_loaded_files(paths), self.config.ingestion_prefetch_files)
+        self._deferring_batch, self._batch_changed = True, False
+        try:
+            for p_str, docs, last in loaded_files:
+                entry = entries_by_path.get(str(Path(p_str)))
+                if docs:
+                    if p_str not in files:
+                        files[p_str] = self._begin_file(p_str, entry["previous_document_id"] if entry else None)
+                    self._ingest_batch(files[p_str], docs)
+                if not last:
+                    continue
+                state = files.pop(p_str, None)
+                if state is None:
+                    if docs is not None:
+                        print(f"No documents loaded from {p_str}.")
+                    continue
+                if docs is None:
+                    state["ok"] = False # loading failed after earlier batches were stored
+                try:
+                    ok = self._finish_file(state)
+                finally:
+                    self._notify_collection_changed()
+                if not ok:
+                    continue
+                # Only files that were stored are recorded; failed ones are retried next time
+                if entry is not None:
+                    self.registry.record([entry])
+                ingested += 1
+        finally:
+            loaded_files.close()
+            self._deferring_batch = False
+            if self._batch_changed:
+                self._notify_batch_listeners()
+        print(f"Successfully ingested {ingested}/{len(paths)} documents in {time.perf_counter() - started:.1f}s.")
+
+    def _existing_chunk_ids(self, doc_ids: List[str]) -> set:
+        with self.engine.connect() as conn:
+            res = conn.execute(
+                text("SELECT chunk_id FROM document_chunks WHERE document_id = ANY(:doc_ids) AND collection_name = :coll"),
+                {"doc_ids": list(doc_ids), "coll": self.config.collection_name}
+            )
+            return {row[0] for row in res}
+
+    def _delete_chunks(self, chunk_ids: List[str]):
+        """Removes individual chunks from document_chunks and the vector store."""
+        with self.engine.connect() as conn, conn.begin():
+            conn.execute(
+                text("DELETE FROM document_chunks WHERE chunk_id = ANY(:chunk_ids) AND collection_name = :coll"),
+                {"chunk_ids": chunk_ids, "coll": self.config.collection_name}
+            )
+            if self.vector_store:
+                self.vector_store.delete(ids=chunk_ids)
+        self._notify_chunks_deleted(chunk_ids)
+
+    def _store_chunk_diff(self, state: Dict[str, Any], docs: List[Document], doc_offset: int):
+        """
+        Content-addressed ingestion of one batch: stores only chunks whose IDs are
+        not stored yet, and collects the batch's IDs so `_finish_file` can delete
+        the chunks that disappeared. Unchanged chunks are not touched.
+        """
+        if self.config.enable_parent_child_chunking:
+            parents, children = self._split_parent_child(docs, doc_offset, state["seen_ids"])
+        else:
+            parents, children = [], self._chunk_documents_standard(docs, doc_offset, state["seen_ids"])
+        children = [c for c in children if c.page_content and c.page_content.strip()]
+
+        existing_ids = state["existing_ids"]
+        state["new_ids"].update(c.metadata["chunk_id"] for c in parents + children)
+        new_parents = [p for p in parents if p.metadata["chunk_id"] not in existing_ids]
+        new_children = [c for c in children if c.metadata["chunk_id"] not in existing_ids]
+        # New chunks are written before the stale ones go, so a failed write leaves the old version searchable
+        self._store_chunks_for_keyword_search(new_parents)
+        self._store_chunk_batches(new_children)
+        state["stored"] += len(new_parents) + len(new_children)
 
     def delete_document_by_id(self, doc_id: str) -> tuple[bool, str]:
         if not doc_id: return False, "Document ID cannot be empty."
         
-        engine = create_engine(self.connection_string)
         try:
-            with engine.connect() as conn, conn.begin():
+            with self.engine.connect() as conn, conn.begin():
                 res = conn.execute(
                     text("SELECT chunk_id FROM document_chunks WHERE document_id = :doc_id AND collection_name = :coll"),
                     {"doc_id": doc_id, "coll": self.config.collection_name}
                 )
                 chunk_ids = [row[0] for row in res]
+                self.registry.forget_document(conn, doc_id)
 
                 if not chunk_ids:
                     return True, f"No chunks found for document ID '{doc_id}'."
@@ -227,9 +800,14 @@ class IngestionHandler:
                     {"doc_id": doc_id, "coll": self.config.collection_name}
                 )
                 
+                # Bump before the PGVector delete, which does not join this transaction
+                version = self._notify_collection_changed(conn)
+
                 if self.vector_store:
                     self.vector_store.delete(ids=chunk_ids)
 
+            self._notify_chunks_deleted(chunk_ids)
+            self._notify_listeners(version)
             return True, f"Deleted {del_res.rowcount} chunks for document ID '{doc_id}'."
         except Exception as e:
             return False, f"Deletion error: {type(e).__name__} - {e}"
@@ -1,19 +1,21 @@
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from typing import List, Dict, Any, Optional, Tuple
 
+from .db import get_engine
+
 class JargonDictionaryManager:
     """Manages the jargon dictionary in the database."""
     
-    def __init__(self, connection_string: str, table_name: str = "jargon_dictionary"):
+    def __init__(self, connection_string: str, table_name: str = "jargon_dictionary", engine=None):
         self.connection_string = connection_string
         self.table_name = table_name
+        self.engine = engine or get_engine(connection_string)
         self._init_jargon_table()
     
     def _init_jargon_table(self):
         """Initializes the jargon dictionary table and its indexes."""
-        engine = create_engine(self.connection_string)
-        with engine.connect() as conn:
+        with self.engine.connect() as conn:
             conn.execute(text(f"""
                 CREATE TABLE IF NOT EXISTS {self.table_name} (
                     id SERIAL PRIMARY KEY,
@@ -36,8 +38,7 @@ class JargonDictionaryManager:
                  confidence_score: float = 1.0) -> bool:
         """Adds or updates a term in the dictionary."""
         try:
-            engine = create_engine(self.connection_string)
-            with engine.connect() as conn:
+            with self.engine.connect() as conn:
                 conn.execute(text(f"""
                     INSERT INTO {self.table_name} 
                     (term, definition, domain, aliases, related_terms, confidence_score)
@@ -65,10 +66,9 @@ class JargonDictionaryManager:
         if not terms:
             return {}
         
-        engine = create_engine(self.connection_string)
         results = {}
         try:
-            with engine.connect() as conn:
+            with self.engine.connect() as conn:
                 placeholders = ', '.join([f':term_{i}' for i in range(len(terms))])
                 query = text(f"""
                     SELECT term, definition, domain, aliases, related_terms, confidence_score
@@ -93,8 +93,7 @@ class JargonDictionaryManager:
     def delete_term(self, term: str) -> bool:
         """Deletes a term from the dictionary."""
         try:
-            engine = create_engine(self.connection_string)
-            with engine.connect() as conn:
+            with self.engine.connect() as conn:
                 conn.execute(text(f"DELETE FROM {self.table_name} WHERE term = :term"), {"term": term})
                 conn.commit()
             return True
@@ -104,9 +103,8 @@ class JargonDictionaryManager:
 
     def get_all_terms(self) -> List[Dict[str, Any]]:
         """Retrieves all terms from the dictionary."""
-        engine = create_engine(self.connection_string)
         try:
-            with engine.connect() as conn:
+            with self.engine.connect() as conn:
                 result = conn.execute(text(f"SELECT * FROM {self.table_name} ORDER BY term")).fetchall()
                 return [dict(row._mapping) for row in result]
         except Exception as e:
@@ -0,0 +1,418 @@
+"""
+In-process exact vector search over a memory-mapped embedding matrix.
+
+The collection's embeddings are exported once from `langchain_pg_embedding`
+into `<dir>/<collection>/vectors.npy`: unit-normalized float16 rows, or int8
+rows with a per-row scale in `scales.npy`. A JSON state file holds the chunk
+IDs (None marks a deleted row) and the collection version the files reflect
+as of its last checkpoint; later appends, deletes and version bumps go to an
+append-only journal (`ids.<generation>.jsonl`, one JSON record per line), so
+a micro-batch writes only its own IDs. The state is rewritten, starting a new
+journal, on export, compaction and `checkpoint()` (once per ingestion run).
+Cosine top-k is a blocked NumPy matrix-vector product.
+
+Every process maps the same files, so Streamlit workers share the pages through
+the OS page cache. A process that sees the state file change reloads it and
+re-maps the files; otherwise it replays the journal lines added since its last
+check. Writers serialize on a lock file where `fcntl` is available.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .result_cache import get_collection_version
+
+EMBEDDINGS_SQL = """
+    SELECT e.custom_id AS chunk_id, CAST(e.embedding AS real[]) AS embedding
+    FROM langchain_pg_embedding e
+    JOIN langchain_pg_collection c ON e.collection_id = c.uuid
+    WHERE c.name = :collection_name
+"""
+EMBEDDINGS_BY_ID_SQL = EMBEDDINGS_SQL + "    AND e.custom_id = ANY(:chunk_ids)\n"
+
+STATE_FORMAT = 2
+STATE_FILE = "state.json"
+VECTORS_FILE = "vectors.npy"
+SCALES_FILE = "scales.npy"
+LOCK_FILE = ".lock"
+SEARCH_BLOCK_ROWS = 16384
+EXPORT_BATCH_ROWS = 2048
+MIN_CAPACITY = 1024
+
+
+class LocalVectorIndex:
+    """
+    Exact cosine search over a memory-mapped float16 / int8 matrix, keyed by chunk ID.
+
+    Kept in sync through the ingestion chunk listeners: stored chunks are looked
+    up in `langchain_pg_embedding` and appended, deleted chunks are tombstoned and
+    compacted away once a quarter of the rows are dead.
+    """
+
+    def __init__(self, engine, directory: str, collection_name: str, dtype: str = "float16",
+                 check_interval: float = 2.0):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported local vector dtype: {dtype}")
+        self.engine = engine
+        self.directory = os.path.join(directory, collection_name)
+        self.collection_name = collection_name
+        self.dtype = dtype
+        self.check_interval = check_interval
+        self.dims = 0
+        self.version = 0
+        self._ids: List[Optional[str]] = []
+        self._slots: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._vectors: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._state_mtime = 0
+        self._last_check = 0.0
+        self._journal = ""
+        self._journal_offset = 0
+        self._pending: List[list] = []
+        self._rewrite_state = False
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    # --- persistence ---
+
+    def exists(self) -> bool:
+        return os.path.exists(self._path(STATE_FILE))
+
+    def _load_state(self):
+        path = self._path(STATE_FILE)
+        mtime = os.stat(path).st_mtime_ns
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("format") != STATE_FORMAT:
+            raise ValueError(f"Unsupported local vector state format: {state.get('format')}")
+        self.dims = state["dims"]
+        self.dtype = state["dtype"]
+        self.version = state["version"]
+        self._ids = state["ids"]
+        self._slots = {chunk_id: slot for slot, chunk_id in enumerate(self._ids) if chunk_id is not None}
+        self._alive = np.array([chunk_id is not None for chunk_id in self._ids], dtype=bool)
+        self._vectors = np.load(self._path(VECTORS_FILE), mmap_mode="r+") if self.dims else None
+        self._scales = np.load(self._path(SCALES_FILE), mmap_mode="r+") if self.dims and self.dtype == "int8" else None
+        self._journal = state["journal"]
+        self._journal_offset = 0
+        self._pending = []
+        self._state_mtime = mtime
+        self._last_check = time.monotonic()
+        self._apply_journal()
+
+    def _apply_journal(self):
+        """Replays the complete journal records written since the last read."""
+        try:
+            with open(self._path(self._journal), "rb") as f:
+                f.seek(self._journal_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return  # superseded by a newer state file, picked up on the next check
+        end = data.rfind(b"\n") + 1  # a record still being written is read next time
+        if not end:
+            return
+        for line in data[:end].splitlines():
+            op, value = json.loads(line)
+            if op == "+":
+                self._add_ids(value)
+            elif op == "-":
+                for chunk_id in value:
+                    self._tombstone(chunk_id)
+            elif op == "v":
+                self.version = value
+        self._journal_offset += end
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if len(self._ids) > capacity:
+            # The writer grew the files into new ones; map those
+            self._vectors = np.load(self._path(VECTORS_FILE), mmap_mode="r+")
+            self._scales = np.load(self._path(SCALES_FILE), mmap_mode="r+") if self.dtype == "int8" else None
+
+    def _flush_vectors(self):
+        if self._vectors is not None:
+            self._vectors.flush()
+        if self._scales is not None:
+            self._scales.flush()
+
+    def _save_state(self):
+        """Checkpoints the full state and starts an empty journal for it."""
+        self._flush_vectors()
+        journal = f"ids.{time.time_ns():x}.jsonl"
+        open(self._path(journal), "wb").close()
+        state = {
+            "format": STATE_FORMAT, "collection_name": self.collection_name, "dims": self.dims,
+            "dtype": self.dtype, "version": self.version, "ids": self._ids, "journal": journal,
+        }
+        tmp_path = self._path(f"{STATE_FILE}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._path(STATE_FILE))
+        self._state_mtime = os.stat(self._path(STATE_FILE)).st_mtime_ns
+        self._journal, self._journal_offset = journal, 0
+        self._pending, self._rewrite_state = [], False
+        for name in os.listdir(self.directory):
+            if name.startswith("ids.") and name.endswith(".jsonl") and name != journal:
+                os.remove(self._path(name))
+
+    def _append_journal(self):
+        """Appends the pending records as complete lines."""
+        self._flush_vectors()  # vectors reach the files before the IDs that point at them
+        data = "".join(json.dumps(record) + "\n" for record in self._pending).encode("utf-8")
+        with open(self._path(self._journal), "ab") as f:
+            if f.tell() != self._journal_offset:
+                f.truncate(self._journal_offset)  # drop a record torn by a writer that crashed
+            f.write(data)
+        self._journal_offset += len(data)
+        self._pending = []
+
+    def _persist(self):
+        if self._rewrite_state or not self.exists():
+            self._save_state()
+        elif self._pending:
+            self._append_journal()
+
+    def _reload_if_changed(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        try:
+            mtime = os.stat(self._path(STATE_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._state_mtime:
+            self._load_state()
+        else:
+            self._apply_journal()
+
+    @contextmanager
+    def _writing(self, reload: bool = True):
+        """Serializes writers across threads and processes and persists their changes afterwards."""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(self._path(LOCK_FILE), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if reload:
+                    self._reload_if_changed(force=True)
+                yield
+                self._persist()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # --- writes ---
+
+    def _quantize(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+        if self.dtype == "float16":
+            return vectors.astype(np.float16), None
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    def _ensure_capacity(self, rows: int):
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, capacity * 2, MIN_CAPACITY)
+        count = len(self._ids)
+        # Grow into a new file and swap it in; readers keep their old mapping until they reload
+        files = [(VECTORS_FILE, self._vectors, np.dtype(self.dtype), (new_capacity, self.dims))]
+        if self.dtype == "int8":
+            files.append((SCALES_FILE, self._scales, np.dtype(np.float32), (new_capacity,)))
+        for name, old, dtype, shape in files:
+            tmp_path = self._path(f"{name}.tmp.npy")
+            grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=shape)
+            if old is not None and count:
+                grown[:count] = old[:count]
+            grown.flush()
+            del grown
+            os.replace(tmp_path, self._path(name))
+        self._vectors = np.load(self._path(VECTORS_FILE), mmap_mode="r+")
+        self._scales = np.load(self._path(SCALES_FILE), mmap_mode="r+") if self.dtype == "int8" else None
+
+    def _append(self, chunk_ids: List[str], vectors: np.ndarray):
+        if not self.dims:
+            self.dims = vectors.shape[1]
+            self._rewrite_state = True  # readers learn the dims from the state file
+        start = len(self._ids)
+        self._ensure_capacity(start + len(chunk_ids))
+        stored, scales = self._quantize(vectors)
+        self._vectors[start:start + len(chunk_ids)] = stored
+        if scales is not None:
+            self._scales[start:start + len(chunk_ids)] = scales
+        self._add_ids(chunk_ids)
+        self._pending.append(["+", chunk_ids])
+
+    def _add_ids(self, chunk_ids: List[str]):
+        """Maps `chunk_ids` to the next rows, tombstoning older rows of the same chunks."""
+        for chunk_id in chunk_ids:
+            self._tombstone(chunk_id)
+        start = len(self._ids)
+        self._ids.extend(chunk_ids)
+        self._slots.update({chunk_id: start + i for i, chunk_id in enumerate(chunk_ids)})
+        self._alive = np.concatenate([self._alive, np.ones(len(chunk_ids), dtype=bool)])
+
+    def _tombstone(self, chunk_id: str):
+        slot = self._slots.pop(chunk_id, None)
+        if slot is not None:
+            self._ids[slot] = None
+            self._alive[slot] = False
+
+    def _fetch_embeddings(self, sql: str, params: Dict[str, Any]):
+        """Yields (chunk_ids, float32 matrix) batches read from langchain_pg_embedding."""
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH_ROWS).execute(text(sql), params)
+            for partition in result.partitions(EXPORT_BATCH_ROWS):
+                yield [row.chunk_id for row in partition], np.asarray([row.embedding for row in partition], dtype=np.float32)
+
+    def build_from_db(self):
+        """Exports the whole collection, replacing any existing files."""
+        with self._writing(reload=False):
+            self._rewrite_state = True
+            self.dims = 0
+            self._ids, self._slots = [], {}
+            self._alive = np.zeros(0, dtype=bool)
+            self._vectors = self._scales = None
+            for name in (VECTORS_FILE, SCALES_FILE):
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+            with self.engine.connect() as conn:
+                self.version = get_collection_version(conn, self.collection_name)
+            for chunk_ids, vectors in self._fetch_embeddings(EMBEDDINGS_SQL, {"collection_name": self.collection_name}):
+                self._append(chunk_ids, vectors)
+
+    def on_chunks_stored(self, rows: List[Dict[str, Any]]):
+        """Ingestion listener: appends the embeddings PGVector stored for these chunks."""
+        chunk_ids = [row["cid"] for row in rows]
+        batches = list(self._fetch_embeddings(EMBEDDINGS_BY_ID_SQL, {"collection_name": self.collection_name, "chunk_ids": chunk_ids}))
+        if not batches:
+            return
+        with self._writing():
+            for batch_ids, vectors in batches:
+                self._append(batch_ids, vectors)
+
+    def remove_many(self, chunk_ids: List[str]):
+        """Ingestion listener: tombstones deleted chunks."""
+        with self._writing():
+            removed = [chunk_id for chunk_id in chunk_ids if chunk_id in self._slots]
+            for chunk_id in removed:
+                self._tombstone(chunk_id)
+            if removed:
+                self._pending.append(["-", removed])
+            if self._ids and len(self._slots) < 0.75 * len(self._ids):
+                self._compact()
+
+    def advance_version(self, version: Optional[int]):
+        """
+        Follows one of this process's own collection bumps. The files are only
+        tagged with `version` when they reflected the version just before it; a
+        gap (changes by another process that never reached these files) or a
+        failed bump leaves the version unknown (None), so the next
+        `load_or_build_local_vector_index` re-exports instead of trusting them.
+        """
+        with self._writing():
+            if self.version is not None and version is not None and version == self.version + 1:
+                self.version = version
+            else:
+                if self.version is not None:
+                    print("[LocalVectors] collection changed outside this process; files will be re-exported on next load.")
+                self.version = None
+            self._pending.append(["v", self.version])
+
+    def checkpoint(self, collection_name: Optional[str] = None):
+        """Batch listener: folds the journal into the state file once per ingestion run."""
+        with self._writing():
+            if self._journal_offset or self._pending:
+                self._rewrite_state = True
+
+    def _compact(self):
+        self._rewrite_state = True
+        live = np.flatnonzero(self._alive)
+        chunk_ids = [self._ids[slot] for slot in live]
+        vectors = np.asarray(self._vectors[live], dtype=np.float32) if len(live) else None
+        scales = np.asarray(self._scales[live]) if self._scales is not None and len(live) else None
+        self._ids, self._slots = [], {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._vectors = self._scales = None
+        for name in (VECTORS_FILE, SCALES_FILE):
+            if os.path.exists(self._path(name)):
+                os.remove(self._path(name))
+        if vectors is None:
+            self.dims = 0
+            return
+        if scales is not None:
+            vectors = vectors * scales[:, None]  # back to unit vectors before re-quantizing
+        self._append(chunk_ids, vectors)
+
+    # --- search ---
+
+    def search(self, query_embedding: List[float], k: int) -> List[Tuple[str, float]]:
+        """Returns up to `k` (chunk_id, cosine distance) pairs, nearest first."""
+        with self._lock:
+            self._reload_if_changed()
+            ids, alive, vectors, scales = self._ids, self._alive, self._vectors, self._scales
+        n = len(alive)
+        if vectors is None or not n or not alive.any():
+            return []
+
+        query = np.array(query_embedding, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        similarities = np.empty(n, dtype=np.float32)
+        for start in range(0, n, SEARCH_BLOCK_ROWS):
+            end = min(start + SEARCH_BLOCK_ROWS, n)
+            similarities[start:end] = np.asarray(vectors[start:end], dtype=np.float32) @ query
+        if scales is not None:
+            similarities *= scales[:n]
+        similarities[~alive] = -np.inf
+
+        k = min(k, int(alive.sum()))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top], kind="stable")]
+        return [(ids[slot], float(1.0 - similarities[slot])) for slot in top if ids[slot] is not None]
+
+    def stats(self) -> Dict[str, Any]:
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        return {
+            "chunks": len(self._slots), "rows": len(self._ids), "capacity": capacity,
+            "dims": self.dims, "dtype": self.dtype, "version": self.version,
+        }
+
+
+def load_or_build_local_vector_index(engine, directory: str, collection_name: str,
+                                     dtype: str = "float16") -> LocalVectorIndex:
+    """Maps the existing files if they match the collection's current version and dtype, otherwise re-exports."""
+    index = LocalVectorIndex(engine, directory, collection_name, dtype=dtype)
+    with engine.connect() as conn:
+        version = get_collection_version(conn, collection_name)
+    if index.exists():
+        try:
+            index._load_state()
+            if index.version == version and index.dtype == dtype:
+                return index
+            print("[LocalVectors] files are stale, re-exporting from langchain_pg_embedding...")
+            index.dtype = dtype
+        except Exception as e:
+            print(f"[LocalVectors] could not load {index.directory}: {e}")
+            index.dtype = dtype
+
+    index.build_from_db()
+    print(f"[LocalVectors] exported {len(index)} embeddings for collection '{collection_name}'.")
+    return index
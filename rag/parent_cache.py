@@ -0,0 +1,57 @@
+"""
+In-process cache of parent chunks for parent/child retrieval.
+"""
+import sys
+from typing import Any, Dict, Iterable, List
+
+from langchain_core.documents import Document
+
+from .cache import LRUCache
+
+
+def _document_size(doc: Document) -> int:
+    """Approximate in-memory footprint of a Document (content plus flat metadata)."""
+    size = sys.getsizeof(doc.page_content)
+    for key, value in doc.metadata.items():
+        size += sys.getsizeof(key) + sys.getsizeof(value)
+    return size
+
+
+class ParentChunkCache:
+    """
+    Bounded, memory-accounted LRU of parent Documents keyed by `parent_chunk_id`.
+
+    The retriever serves parents from here and only queries document_chunks for
+    the misses. Ingestion's chunk listeners drop entries whose chunk is rewritten
+    or deleted; the TTL bounds staleness from writes made by other processes.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 3600):
+        self.docs = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds, max_bytes=max_bytes, sizeof=_document_size)
+
+    def get_many(self, parent_ids: Iterable[str]) -> Dict[str, Document]:
+        found = {}
+        for parent_id in parent_ids:
+            doc = self.docs.get(parent_id)
+            if doc is not None:
+                found[parent_id] = doc
+        return found
+
+    def put_many(self, parent_docs: Dict[str, Document]):
+        for parent_id, doc in parent_docs.items():
+            self.docs.put(parent_id, doc)
+
+    def on_chunks_stored(self, rows: List[Dict[str, Any]]):
+        """Ingestion listener: a rewritten parent must be re-read from the DB."""
+        for row in rows:
+            self.docs.pop(row["cid"])
+
+    def on_chunks_deleted(self, chunk_ids: List[str]):
+        for chunk_id in chunk_ids:
+            self.docs.pop(chunk_id)
+
+    def clear(self):
+        self.docs.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.docs.stats()
@@ -0,0 +1,94 @@
+"""
+Client-side rate limiting and retry helpers for Azure OpenAI calls made from
+worker threads (image summaries, ingestion embeddings).
+"""
+import random
+import threading
+import time
+from typing import Optional
+
+import openai
+
+# Transient API errors worth retrying; anything else fails the request immediately
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """The server's Retry-After hint on a rate-limit response, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for header in ("retry-after-ms", "retry-after"):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            seconds = float(value)
+        except (TypeError, ValueError):
+            continue
+        return seconds / 1000 if header == "retry-after-ms" else seconds
+    return None
+
+
+def backoff_delay(error: Exception, attempt: int, max_backoff: float) -> float:
+    """Retry-After if the server sent one, else jittered exponential backoff capped at `max_backoff`."""
+    delay = retry_after_seconds(error)
+    if delay is None:
+        delay = min(max_backoff, 2 ** attempt) * (0.5 + random.random())
+    return delay
+
+
+class RequestPacer:
+    """
+    Spaces request starts across threads to at most `requests_per_minute`, and
+    lets a 429 pause every thread until the server's cooldown has passed, so
+    concurrent workers do not keep hammering a throttled deployment.
+    """
+
+    def __init__(self, requests_per_minute: float = 0):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+        self._paused_until = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start, self._paused_until)
+            self._next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at `per_minute` tokens per minute, holding
+    at most one minute's worth. `acquire` blocks until the tokens are available;
+    a request larger than the bucket waits for a full bucket. `per_minute` <= 0
+    disables limiting.
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0 if per_minute > 0 else 0.0
+        self.capacity = float(per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float):
+        if not self.rate:
+            return
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(wait)
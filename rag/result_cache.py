@@ -0,0 +1,109 @@
+"""
+Retrieval result caching with ingestion-aware invalidation.
+
+Every collection has a version counter in the `collection_versions` table.
+Ingestion and deletion bump it, and cached results are keyed by that version,
+so all app processes stop serving stale results as soon as the corpus changes.
+"""
+import threading
+import time
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from sqlalchemy import text
+from langchain_core.documents import Document
+
+from .cache import LRUCache
+
+COLLECTION_VERSIONS_TABLE = "collection_versions"
+
+
+def init_collection_versions_table(conn):
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {COLLECTION_VERSIONS_TABLE} (
+            collection_name TEXT PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+
+
+def bump_collection_version(conn, collection_name: str) -> int:
+    """Increments the collection's version within the caller's transaction and returns the new value."""
+    return conn.execute(text(f"""
+        INSERT INTO {COLLECTION_VERSIONS_TABLE} (collection_name, version) VALUES (:coll, 1)
+        ON CONFLICT (collection_name) DO UPDATE SET
+            version = {COLLECTION_VERSIONS_TABLE}.version + 1, updated_at = CURRENT_TIMESTAMP
+        RETURNING version
+    """), {"coll": collection_name}).scalar_one()
+
+
+def get_collection_version(conn, collection_name: str) -> int:
+    version = conn.execute(
+        text(f"SELECT version FROM {COLLECTION_VERSIONS_TABLE} WHERE collection_name = :coll"),
+        {"coll": collection_name}
+    ).scalar()
+    return int(version or 0)
+
+
+class RetrievalResultCache:
+    """
+    Caches retrieved documents keyed by query, retrieval settings and collection version.
+
+    The collection version is read from the database at most once every
+    `version_check_interval` seconds per collection; `invalidate()` makes the
+    next lookup re-read it immediately (used after local ingestion).
+    """
+
+    def __init__(self, engine, max_entries: int = 512, ttl_seconds: Optional[float] = 600,
+                 version_check_interval: float = 2.0):
+        self.engine = engine
+        self.results = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.version_check_interval = version_check_interval
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def collection_version(self, collection_name: str) -> int:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._versions.get(collection_name)
+        if cached is not None and now - cached[1] < self.version_check_interval:
+            return cached[0]
+
+        with self.engine.connect() as conn:
+            version = get_collection_version(conn, collection_name)
+        with self._lock:
+            self._versions[collection_name] = (version, now)
+        return version
+
+    @staticmethod
+    def make_key(query: str, search_type: str, config) -> Tuple[Hashable, ...]:
+        return (
+            query, search_type, config.collection_name,
+            config.vector_search_k, config.keyword_search_k, config.final_k, config.rrf_k_for_fusion,
+            config.enable_parent_child_chunking, config.hybrid_engine, config.keyword_engine, config.vector_engine,
+        )
+
+    def get(self, key: Tuple[Hashable, ...], collection_name: str) -> Optional[List[Document]]:
+        try:
+            version = self.collection_version(collection_name)
+        except Exception as e:
+            print(f"[ResultCache] version lookup error: {e}")
+            return None
+        docs = self.results.get((version, key))
+        return list(docs) if docs is not None else None
+
+    def put(self, key: Tuple[Hashable, ...], collection_name: str, docs: List[Document]):
+        with self._lock:
+            cached = self._versions.get(collection_name)
+        if cached is not None:
+            self.results.put((cached[0], key), list(docs))
+
+    def invalidate(self, collection_name: Optional[str] = None):
+        with self._lock:
+            if collection_name is None:
+                self._versions.clear()
+            else:
+                self._versions.pop(collection_name, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.results.stats()
@@ -1,15 +1,134 @@
 import json
-from sqlalchemy import create_engine, text
-from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from typing import List, Dict, Any, Optional, Tuple, Union
 
 from langchain_community.vectorstores import PGVector
 from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
-from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.callbacks import CallbackManagerForRetrieverRun, AsyncCallbackManagerForRetrieverRun
 from langchain_core.runnables import RunnableConfig
 
 from .config import Config
 from .text_processor import JapaneseTextProcessor
+from .db import get_engine, get_async_engine
+from .embedding_cache import QueryEmbeddingCache
+from .result_cache import RetrievalResultCache
+from .vector_index import VectorIndexManager
+from .bm25 import BM25Index
+from .parent_cache import ParentChunkCache
+from .local_vectors import LocalVectorIndex
+
+# Cosine-distance search by query vector over the langchain PGVector tables.
+# `{query_vector}` is ":embedding" for a single query or a column of the batch's unnest().
+VECTOR_SEARCH_SQL = """
+    SELECT e.custom_id AS chunk_id, e.document AS content, e.cmetadata AS metadata,
+           e.embedding <=> CAST({query_vector} AS vector) AS score
+    FROM langchain_pg_embedding e
+    JOIN langchain_pg_collection c ON e.collection_id = c.uuid
+    WHERE c.name = :collection_name
+    ORDER BY score ASC LIMIT :k
+"""
+
+# Keyword legs; `{query}` is ":q" for a single query or a column of the batch's unnest().
+# tokenized_tsv holds the Janome tokens written at ingestion time, with positions and
+# frequencies (GIN-indexed, see RAGSystem._init_db). The query tokens are parsed the same
+# way and must all match, as in the original LIKE search; ts_rank weighs term frequency
+# and normalization 1 divides by 1 + log(chunk length) so long chunks do not win by size.
+JA_KEYWORD_SEARCH_SQL = """
+    SELECT chunk_id, content, metadata, ts_rank(tokenized_tsv, query, 1) AS score
+    FROM document_chunks, plainto_tsquery('simple', {query}) AS query
+    WHERE tokenized_tsv @@ query AND collection_name = :collection_name
+    ORDER BY score DESC LIMIT :keyword_k
+"""
+
+# content_tsv is a stored generated column with a GIN index (see RAGSystem._init_db)
+KEYWORD_SEARCH_SQL = """
+    SELECT chunk_id, content, metadata, ts_rank(content_tsv, query) AS score
+    FROM document_chunks, plainto_tsquery('{language}', {query}) AS query
+    WHERE content_tsv @@ query AND collection_name = :collection_name
+    ORDER BY score DESC LIMIT :keyword_k
+"""
+
+# Runs one search per element of :queries in a single statement; `ord` is the 1-based query position
+BATCH_SEARCH_SQL = """
+    SELECT q.ord, s.chunk_id, s.content, s.metadata, s.score
+    FROM unnest(CAST(:queries AS text[])) WITH ORDINALITY AS q(query_text, ord)
+    CROSS JOIN LATERAL ({search_sql}) s
+"""
+
+# Projects a search down to (chunk_id, score) for lazy hydration; unused columns are never read
+IDS_ONLY_SQL = """
+    SELECT s.chunk_id, s.score FROM ({search_sql}) s
+"""
+
+HYDRATE_CHUNKS_SQL = """
+    SELECT chunk_id, content, metadata
+    FROM document_chunks
+    WHERE chunk_id = ANY(:chunk_ids)
+"""
+
+PARENT_CHUNKS_SQL = """
+    SELECT content, metadata
+    FROM document_chunks
+    WHERE chunk_id = ANY(:parent_ids) AND collection_name = :collection_name
+"""
+
+RECENT_PARENT_CHUNKS_SQL = """
+    SELECT content, metadata
+    FROM document_chunks
+    WHERE collection_name = :collection_name AND (metadata->>'is_parent')::boolean
+    ORDER BY created_at DESC LIMIT :limit
+"""
+
+# Both rankings and the RRF fusion in one statement; only the fused top `final_k`
+# rows are returned. Content is hydrated from document_chunks by primary key, with
+# the vector leg's own copy as a fallback for rows that only exist in PGVector.
+HYBRID_SEARCH_SQL = """
+    WITH vector_leg AS (
+        SELECT v.chunk_id, v.content, v.metadata, ROW_NUMBER() OVER (ORDER BY v.score ASC) AS rank
+        FROM ({vector_sql}) v
+    ),
+    keyword_leg AS (
+        SELECT kw.chunk_id, ROW_NUMBER() OVER (ORDER BY kw.score DESC) AS rank
+        FROM ({keyword_sql}) kw
+    ),
+    fused AS (
+        SELECT legs.chunk_id, SUM(1.0 / (:rrf_k + legs.rank)) AS score, MIN(legs.rank) AS best_rank
+        FROM (
+            SELECT chunk_id, rank FROM vector_leg
+            UNION ALL
+            SELECT chunk_id, rank FROM keyword_leg
+        ) legs
+        GROUP BY legs.chunk_id
+        ORDER BY score DESC, best_rank ASC
+        LIMIT :final_k
+    )
+    SELECT f.chunk_id, COALESCE(dc.content, v.content) AS content, COALESCE(dc.metadata, v.metadata) AS metadata, f.score
+    FROM fused f
+    LEFT JOIN vector_leg v ON v.chunk_id = f.chunk_id
+    LEFT JOIN document_chunks dc ON dc.chunk_id = f.chunk_id
+    ORDER BY f.score DESC, f.best_rank ASC
+"""
+
+EMPTY_KEYWORD_LEG_SQL = "SELECT NULL::text AS chunk_id, NULL::float AS score WHERE false"
+
+# Sync retrievals run the vector leg here while the calling thread runs the keyword leg
+_LEG_EXECUTOR = ThreadPoolExecutor(thread_name_prefix="retriever-leg")
+
+def _run_legs(vector_leg, keyword_leg):
+    """Runs both legs concurrently and returns (vector result, keyword result)."""
+    future = _LEG_EXECUTOR.submit(vector_leg)
+    keyword_result = keyword_leg()
+    return future.result(), keyword_result
+
+def _to_pgvector_literal(embedding: List[float]) -> str:
+    return "[" + ",".join(str(float(x)) for x in embedding) + "]"
+
+def _load_metadata(raw: Any) -> Dict[str, Any]:
+    return raw if isinstance(raw, dict) else json.loads(raw or "{}")
 
 class JapaneseHybridRetriever(BaseRetriever):
     """
@@ -22,71 +141,366 @@ class JapaneseHybridRetriever(BaseRetriever):
     config_params: Config
     text_processor: JapaneseTextProcessor
     search_type: str = "ハイブリッド検索"
-    
+    engine: Optional[Engine] = None
+    embedding_cache: Optional[QueryEmbeddingCache] = None
+    result_cache: Optional[RetrievalResultCache] = None
+    vector_index: Optional[VectorIndexManager] = None
+    bm25_index: Optional[BM25Index] = None
+    parent_cache: Optional[ParentChunkCache] = None
+    local_vectors: Optional[LocalVectorIndex] = None
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.text_processor = JapaneseTextProcessor()
+        if self.engine is None:
+            self.engine = get_engine(self.connection_string)
+
+    def _embed_query(self, q: str) -> List[float]:
+        if self.embedding_cache is not None:
+            return self.embedding_cache.embed_query(q)
+        return self.vector_store.embeddings.embed_query(q)
+
+    async def _aembed_query(self, q: str) -> List[float]:
+        if self.embedding_cache is not None:
+            return await self.embedding_cache.aembed_query(q)
+        return await self.vector_store.embeddings.aembed_query(q)
+
+    @staticmethod
+    def _leg_failed(failures: Optional[List[str]], leg: str, exc: Exception):
+        """Reports a failed leg; `failures` collects them so a degraded result is not cached."""
+        print(f"[HybridRetriever] {leg} error: {exc}")
+        if failures is not None:
+            failures.append(leg)
+
+    def _vector_search_params(self, embedding: List[float]) -> Dict[str, Any]:
+        return {
+            "embedding": _to_pgvector_literal(embedding),
+            "collection_name": self.config_params.collection_name,
+            "k": self.config_params.vector_search_k
+        }
+
+    @property
+    def _use_local_vectors(self) -> bool:
+        return self.local_vectors is not None and self.config_params.vector_engine == "local"
 
-    def _vector_search(self, q: str, config: Optional[RunnableConfig] = None) -> List[Tuple[Document, float]]:
-        if not self.vector_store: 
+    def _vector_search_sql(self, query_vector: str = ":embedding") -> str:
+        # Prefer the query shape that matches the managed ANN index, if one exists
+        index_sql = self.vector_index.search_sql(query_vector) if self.vector_index is not None else None
+        return index_sql or VECTOR_SEARCH_SQL.format(query_vector=query_vector)
+
+    def _vector_search(self, q: str, config: Optional[RunnableConfig] = None, failures: Optional[List[str]] = None) -> List[Tuple[Document, float]]:
+        if not self.vector_store:
             return []
-        try: 
-            return self.vector_store.similarity_search_with_score(q, k=self.config_params.vector_search_k)
-        except Exception as exc: 
-            print(f"[HybridRetriever] vector search error: {exc}")
+        try:
+            embedding = self._embed_query(q)
+            if self._use_local_vectors:
+                return self._hydrate(self.local_vectors.search(embedding, self.config_params.vector_search_k))
+            with self.engine.connect() as conn:
+                if self.vector_index is not None:
+                    self.vector_index.apply_search_settings(conn)
+                return self._rows_to_scored_documents(conn.execute(text(self._vector_search_sql()), self._vector_search_params(embedding)))
+        except Exception as exc:
+            self._leg_failed(failures, "vector search", exc)
             return []
 
-    def _keyword_search(self, q: str, config: Optional[RunnableConfig] = None) -> List[Tuple[Document, float]]:
-        """Performs keyword-based search with Japanese tokenization support."""
-        engine = create_engine(self.connection_string)
-        res: List[Tuple[Document, float]] = []
-        
+    def _keyword_query_spec(self, q: str) -> Optional[Tuple[str, str]]:
+        """
+        Returns ("ja", space-joined tokens) for Japanese token search, ("en", normalized query)
+        for tsvector FTS, or None if the query has no usable tokens.
+        """
         normalized_query = self.text_processor.normalize_text(q)
         is_japanese = self.text_processor.is_japanese(normalized_query)
-        
-        try:
-            with engine.connect() as conn:
-                if is_japanese and self.config_params.enable_japanese_search:
-                    tokens = self.text_processor.tokenize(normalized_query)
-                    if not tokens: return []
-                    
-                    conditions = []
-                    params = {}
-                    for i, token in enumerate(tokens[:5]):
-                        if len(token) >= self.config_params.japanese_min_token_length:
-                            conditions.append(f"(content LIKE :token{i} OR tokenized_content LIKE :token{i})")
-                            params[f"token{i}"] = f"%{token}%"
-                    
-                    if not conditions: return []
-                    
-                    where_clause = " AND ".join(conditions)
-                    sql = f"""
-                        SELECT chunk_id, content, metadata, 
-                               (LENGTH(content) - LENGTH(REPLACE(LOWER(content), LOWER(:original_query), ''))) / LENGTH(:original_query) AS score
-                        FROM document_chunks 
-                        WHERE {where_clause} AND collection_name = :collection_name
-                        ORDER BY score DESC LIMIT :k;
-                    """
-                    params.update({"original_query": normalized_query, "collection_name": self.config_params.collection_name, "k": self.config_params.keyword_search_k})
-                    db_result = conn.execute(text(sql), params)
-                else:
-                    sql = f"""
-                        SELECT chunk_id, content, metadata, 
-                               ts_rank(to_tsvector('{self.config_params.fts_language}', content), plainto_tsquery('{self.config_params.fts_language}', :q)) AS score 
-                        FROM document_chunks 
-                        WHERE to_tsvector('{self.config_params.fts_language}', content) @@ plainto_tsquery('{self.config_params.fts_language}', :q) 
-                        AND collection_name = :collection_name 
-                        ORDER BY score DESC LIMIT :k;
-                    """
-                    db_result = conn.execute(text(sql), {"q": normalized_query, "k": self.config_params.keyword_search_k, "collection_name": self.config_params.collection_name})
-                
-                for row in db_result:
-                    md = row.metadata if isinstance(row.metadata, dict) else json.loads(row.metadata or "{}")
-                    res.append((Document(page_content=row.content, metadata=md), float(row.score)))
-                    
+
+        if is_japanese and self.config_params.enable_japanese_search:
+            tokens = self.text_processor.tokenize(normalized_query)
+            if not tokens: return None
+
+            lexemes = [t.lower() for t in tokens[:5] if len(t) >= self.config_params.japanese_min_token_length]
+            if not lexemes: return None
+            return "ja", " ".join(dict.fromkeys(lexemes))
+
+        return "en", normalized_query
+
+    def _keyword_search_sql(self, kind: str, query: str) -> str:
+        if kind == "ja":
+            return JA_KEYWORD_SEARCH_SQL.format(query=query)
+        return KEYWORD_SEARCH_SQL.format(language=self.config_params.fts_language, query=query)
+
+    def _build_keyword_query(self, q: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Builds the keyword-search SQL and its parameters, or None if the query has no usable tokens."""
+        spec = self._keyword_query_spec(q)
+        if spec is None:
+            return None
+        kind, value = spec
+        params = {"collection_name": self.config_params.collection_name, "keyword_k": self.config_params.keyword_search_k, "q": value}
+        return self._keyword_search_sql(kind, ":q"), params
+
+    @staticmethod
+    def _rows_to_scored_documents(rows) -> List[Tuple[Document, float]]:
+        return [(Document(page_content=row.content, metadata=_load_metadata(row.metadata)), float(row.score)) for row in rows]
+
+    @property
+    def _use_bm25(self) -> bool:
+        return self.bm25_index is not None and self.config_params.keyword_engine == "bm25"
+
+    def _bm25_search(self, q: str) -> List[Tuple[str, float]]:
+        tokens = self.text_processor.tokenize(self.text_processor.normalize_text(q))
+        return self.bm25_index.search(tokens, self.config_params.keyword_search_k)
+
+    @staticmethod
+    def _order_hydrated(rows, scored_ids: List[Tuple[str, float]]) -> List[Tuple[Document, float]]:
+        by_id = {row.chunk_id: row for row in rows}
+        return [
+            (Document(page_content=by_id[cid].content, metadata=_load_metadata(by_id[cid].metadata)), score)
+            for cid, score in scored_ids if cid in by_id
+        ]
+
+    def _hydrate(self, scored_ids: List[Tuple[str, float]]) -> List[Tuple[Document, float]]:
+        """Fetches content and metadata for ranked chunk IDs in one primary-key query."""
+        if not scored_ids:
+            return []
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(HYDRATE_CHUNKS_SQL), {"chunk_ids": [cid for cid, _ in scored_ids]}).fetchall()
+        return self._order_hydrated(rows, scored_ids)
+
+    def _hydrate_many(self, ranked: List[List[Tuple[str, float]]]) -> List[List[Tuple[Document, float]]]:
+        """Hydrates several ranked ID lists with one query over their union."""
+        chunk_ids = list(dict.fromkeys(cid for scored_ids in ranked for cid, _ in scored_ids))
+        if not chunk_ids:
+            return [[] for _ in ranked]
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(HYDRATE_CHUNKS_SQL), {"chunk_ids": chunk_ids}).fetchall()
+        return [self._order_hydrated(rows, scored_ids) for scored_ids in ranked]
+
+    async def _ahydrate(self, scored_ids: List[Tuple[str, float]]) -> List[Tuple[Document, float]]:
+        if not scored_ids:
+            return []
+        async_engine = get_async_engine(self.connection_string)
+        if async_engine is None:
+            return await asyncio.to_thread(self._hydrate, scored_ids)
+        async with async_engine.connect() as conn:
+            result = await conn.execute(text(HYDRATE_CHUNKS_SQL), {"chunk_ids": [cid for cid, _ in scored_ids]})
+            rows = result.fetchall()
+        return self._order_hydrated(rows, scored_ids)
+
+    def _keyword_search(self, q: str, config: Optional[RunnableConfig] = None, failures: Optional[List[str]] = None) -> List[Tuple[Document, float]]:
+        """Performs keyword-based search with Japanese tokenization support."""
+        if self._use_bm25:
+            try:
+                return self._hydrate(self._bm25_search(q))
+            except Exception as exc:
+                self._leg_failed(failures, "BM25 keyword search", exc)
+                return []
+        query = self._build_keyword_query(q)
+        if query is None:
+            return []
+        sql, params = query
+        try:
+            with self.engine.connect() as conn:
+                return self._rows_to_scored_documents(conn.execute(text(sql), params))
         except Exception as exc:
-            print(f"[HybridRetriever] keyword search error: {exc}")
-        return res
+            self._leg_failed(failures, "keyword search", exc)
+            return []
+
+    @property
+    def _use_sql_hybrid(self) -> bool:
+        # The single-statement engine needs both legs to live in Postgres
+        return self.config_params.hybrid_engine == "sql" and not self._use_bm25 and not self._use_local_vectors
+
+    def _build_hybrid_query(self, q: str, embedding: List[float]) -> Tuple[str, Dict[str, Any]]:
+        """Builds the single-round-trip hybrid query (see HYBRID_SEARCH_SQL)."""
+        params = self._vector_search_params(embedding)
+        keyword_query = self._build_keyword_query(q)
+        if keyword_query is None:
+            keyword_sql = EMPTY_KEYWORD_LEG_SQL
+        else:
+            keyword_sql, keyword_params = keyword_query
+            params.update(keyword_params)
+        params.update({"rrf_k": self.config_params.rrf_k_for_fusion, "final_k": self.config_params.final_k})
+        sql = HYBRID_SEARCH_SQL.format(vector_sql=self._vector_search_sql(), keyword_sql=keyword_sql)
+        return sql, params
+
+    def _hybrid_search_in_sql(self, q: str, failures: Optional[List[str]] = None) -> List[Document]:
+        try:
+            sql, params = self._build_hybrid_query(q, self._embed_query(q))
+            with self.engine.connect() as conn:
+                if self.vector_index is not None:
+                    self.vector_index.apply_search_settings(conn)
+                return [doc for doc, _ in self._rows_to_scored_documents(conn.execute(text(sql), params))]
+        except Exception as exc:
+            self._leg_failed(failures, "SQL hybrid search", exc)
+            return []
+
+    async def _ahybrid_search_in_sql(self, q: str, failures: Optional[List[str]] = None) -> List[Document]:
+        async_engine = get_async_engine(self.connection_string)
+        if async_engine is None:
+            return await asyncio.to_thread(self._hybrid_search_in_sql, q, failures)
+        try:
+            sql, params = self._build_hybrid_query(q, await self._aembed_query(q))
+            async with async_engine.connect() as conn:
+                if self.vector_index is not None:
+                    await self.vector_index.aapply_search_settings(conn)
+                result = await conn.execute(text(sql), params)
+                return [doc for doc, _ in self._rows_to_scored_documents(result.fetchall())]
+        except Exception as exc:
+            self._leg_failed(failures, "async SQL hybrid search", exc)
+            return []
+
+    async def _avector_search(self, q: str, failures: Optional[List[str]] = None) -> List[Tuple[Document, float]]:
+        """Embeds the query and runs the pgvector search without blocking the event loop."""
+        if not self.vector_store:
+            return []
+        async_engine = get_async_engine(self.connection_string)
+        if async_engine is None:
+            return await asyncio.to_thread(self._vector_search, q, None, failures)
+        try:
+            embedding = await self._aembed_query(q)
+            if self._use_local_vectors:
+                scored_ids = await asyncio.to_thread(self.local_vectors.search, embedding, self.config_params.vector_search_k)
+                return await self._ahydrate(scored_ids)
+            async with async_engine.connect() as conn:
+                if self.vector_index is not None:
+                    await self.vector_index.aapply_search_settings(conn)
+                result = await conn.execute(text(self._vector_search_sql()), self._vector_search_params(embedding))
+                return self._rows_to_scored_documents(result.fetchall())
+        except Exception as exc:
+            self._leg_failed(failures, "async vector search", exc)
+            return []
+
+    async def _akeyword_search(self, q: str, failures: Optional[List[str]] = None) -> List[Tuple[Document, float]]:
+        if self._use_bm25:
+            try:
+                return await self._ahydrate(self._bm25_search(q))
+            except Exception as exc:
+                self._leg_failed(failures, "BM25 keyword search", exc)
+                return []
+        async_engine = get_async_engine(self.connection_string)
+        if async_engine is None:
+            return await asyncio.to_thread(self._keyword_search, q, None, failures)
+        query = self._build_keyword_query(q)
+        if query is None:
+            return []
+        sql, params = query
+        try:
+            async with async_engine.connect() as conn:
+                result = await conn.execute(text(sql), params)
+                return self._rows_to_scored_documents(result.fetchall())
+        except Exception as exc:
+            self._leg_failed(failures, "async keyword search", exc)
+            return []
+
+    # --- Lazy hydration: legs return (chunk_id, score), content is fetched for the fused top-k only ---
+
+    def _run_id_search(self, sql: str, params: Dict[str, Any], descending: bool, vector: bool = False) -> List[Tuple[str, float]]:
+        with self.engine.connect() as conn:
+            if vector and self.vector_index is not None:
+                self.vector_index.apply_search_settings(conn)
+            rows = conn.execute(text(IDS_ONLY_SQL.format(search_sql=sql)), params).fetchall()
+        return sorted(((row.chunk_id, float(row.score)) for row in rows), key=lambda x: x[1], reverse=descending)
+
+    async def _arun_id_search(self, async_engine, sql: str, params: Dict[str, Any], descending: bool, vector: bool = False) -> List[Tuple[str, float]]:
+        async with async_engine.connect() as conn:
+            if vector and self.vector_index is not None:
+                await self.vector_index.aapply_search_settings(conn)
+            result = await conn.execute(text(IDS_ONLY_SQL.format(search_sql=sql)), params)
+            rows = result.fetchall()
+        return sorted(((row.chunk_id, float(row.score)) for row in rows), key=lambda x: x[1], reverse=descending)
+
+    def _vector_search_ids(self, q: str, failures: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        if not self.vector_store:
+            return []
+        try:
+            embedding = self._embed_query(q)
+            if self._use_local_vectors:
+                return self.local_vectors.search(embedding, self.config_params.vector_search_k)
+            return self._run_id_search(self._vector_search_sql(), self._vector_search_params(embedding), descending=False, vector=True)
+        except Exception as exc:
+            self._leg_failed(failures, "vector search", exc)
+            return []
+
+    async def _avector_search_ids(self, q: str, failures: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        if not self.vector_store:
+            return []
+        async_engine = get_async_engine(self.connection_string)
+        if async_engine is None:
+            return await asyncio.to_thread(self._vector_search_ids, q, failures)
+        try:
+            embedding = await self._aembed_query(q)
+            if self._use_local_vectors:
+                return await asyncio.to_thread(self.local_vectors.search, embedding, self.config_params.vector_search_k)
+            return await self._arun_id_search(async_engine, self._vector_search_sql(), self._vector_search_params(embedding), descending=False, vector=True)
+        except Exception as exc:
+            self._leg_failed(failures, "async vector search", exc)
+            return []
+
+    def _keyword_search_ids(self, q: str, failures: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        try:
+            if self._use_bm25:
+                return self._bm25_search(q)
+            query = self._build_keyword_query(q)
+            if query is None:
+                return []
+            sql, params = query
+            return self._run_id_search(sql, params, descending=True)
+        except Exception as exc:
+            self._leg_failed(failures, "keyword search", exc)
+            return []
+
+    async def _akeyword_search_ids(self, q: str, failures: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        async_engine = get_async_engine(self.connection_string)
+        if self._use_bm25 or async_engine is None:
+            return await asyncio.to_thread(self._keyword_search_ids, q, failures)
+        try:
+            query = self._build_keyword_query(q)
+            if query is None:
+                return []
+            sql, params = query
+            return await self._arun_id_search(async_engine, sql, params, descending=True)
+        except Exception as exc:
+            self._leg_failed(failures, "async keyword search", exc)
+            return []
+
+    def _reciprocal_rank_fusion_ids(self, vres: List[Tuple[str, float]], kres: List[Tuple[str, float]]) -> List[str]:
+        scores: Dict[str, float] = {}
+        for results in (vres, kres):
+            for r, (chunk_id, _) in enumerate(results, 1):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + self._rrf_hybrid(r, self.config_params.rrf_k_for_fusion)
+        return sorted(scores, key=scores.get, reverse=True)[:self.config_params.final_k]
+
+    def _ids_to_hydrate(self, chunk_ids: List[str]) -> List[Tuple[str, float]]:
+        # In parent/child mode every ranked child is kept, as in the eager path
+        if not self.config_params.enable_parent_child_chunking:
+            chunk_ids = chunk_ids[:self.config_params.final_k]
+        return [(chunk_id, 0.0) for chunk_id in chunk_ids]
+
+    @property
+    def _use_lazy_hydration(self) -> bool:
+        # The SQL hybrid engine already hydrates only its fused top-k
+        return self.config_params.enable_lazy_hydration and (self.search_type == 'ベクトル検索' or not self._use_sql_hybrid)
+
+    def _retrieve_lazily(self, query: str, failures: Optional[List[str]] = None) -> List[Document]:
+        if self.search_type == 'ベクトル検索':
+            chunk_ids = [chunk_id for chunk_id, _ in self._vector_search_ids(query, failures)]
+        else:
+            vres, kres = _run_legs(lambda: self._vector_search_ids(query, failures), lambda: self._keyword_search_ids(query, failures))
+            chunk_ids = self._reciprocal_rank_fusion_ids(vres, kres)
+        try:
+            return [doc for doc, _ in self._hydrate(self._ids_to_hydrate(chunk_ids))]
+        except Exception as exc:
+            self._leg_failed(failures, "hydration", exc)
+            return []
+
+    async def _aretrieve_lazily(self, query: str, failures: Optional[List[str]] = None) -> List[Document]:
+        if self.search_type == 'ベクトル検索':
+            chunk_ids = [chunk_id for chunk_id, _ in await self._avector_search_ids(query, failures)]
+        else:
+            vres, kres = await asyncio.gather(self._avector_search_ids(query, failures), self._akeyword_search_ids(query, failures))
+            chunk_ids = self._reciprocal_rank_fusion_ids(vres, kres)
+        try:
+            return [doc for doc, _ in await self._ahydrate(self._ids_to_hydrate(chunk_ids))]
+        except Exception as exc:
+            self._leg_failed(failures, "async hydration", exc)
+            return []
 
     @staticmethod
     def _rrf_hybrid(rank: int, k: int = 60) -> float:
@@ -95,48 +509,32 @@ class JapaneseHybridRetriever(BaseRetriever):
     def _reciprocal_rank_fusion_hybrid(self, vres: List[Tuple[Document, float]], kres: List[Tuple[Document, float]]) -> List[Document]:
         score_map: Dict[str, Dict[str, Any]] = {}
         _id = lambda d: d.metadata.get("chunk_id", d.page_content[:100])
-        
+
         for r, (d, _) in enumerate(vres, 1):
             doc_id_val = _id(d)
             score_map.setdefault(doc_id_val, {"doc": d, "s": 0.0})["s"] += self._rrf_hybrid(r, self.config_params.rrf_k_for_fusion)
-            
+
         for r, (d, _) in enumerate(kres, 1):
             doc_id_val = _id(d)
             score_map.setdefault(doc_id_val, {"doc": d, "s": 0.0})["s"] += self._rrf_hybrid(r, self.config_params.rrf_k_for_fusion)
-            
+
         ranked = sorted(score_map.values(), key=lambda x: x["s"], reverse=True)
         return [x["doc"] for x in ranked[:self.config_params.final_k]]
 
-    def _fetch_parent_chunks(self, child_docs: List[Document]) -> List[Document]:
-        """Fetches parent chunks for a list of child documents."""
-        parent_ids_to_fetch = []
-        for doc in child_docs:
-            if "parent_chunk_id" in doc.metadata:
-                parent_ids_to_fetch.append(doc.metadata["parent_chunk_id"])
-        
-        if not parent_ids_to_fetch:
-            return child_docs
+    @staticmethod
+    def _parent_ids(child_docs: List[Document]) -> List[str]:
+        return list({doc.metadata["parent_chunk_id"] for doc in child_docs if "parent_chunk_id" in doc.metadata})
 
-        unique_parent_ids = list(set(parent_ids_to_fetch))
-        engine = create_engine(self.connection_string)
-        
-        sql = text("""
-            SELECT content, metadata 
-            FROM document_chunks 
-            WHERE chunk_id = ANY(:parent_ids) AND collection_name = :collection_name
-        """)
-        
-        try:
-            with engine.connect() as conn:
-                db_result = conn.execute(sql, {"parent_ids": unique_parent_ids, "collection_name": self.config_params.collection_name})
-                parent_docs_map = {
-                    json.loads(row.metadata).get("chunk_id"): Document(page_content=row.content, metadata=json.loads(row.metadata or "{}"))
-                    for row in db_result
-                }
-        except Exception as e:
-            print(f"Error fetching parent chunks: {e}")
-            return child_docs # Fallback to child docs on error
+    @staticmethod
+    def _parent_docs_map(rows) -> Dict[str, Document]:
+        parent_docs_map = {}
+        for row in rows:
+            md = _load_metadata(row.metadata)
+            parent_docs_map[md.get("chunk_id")] = Document(page_content=row.content, metadata=md)
+        return parent_docs_map
 
+    @staticmethod
+    def _replace_with_parents(child_docs: List[Document], parent_docs_map: Dict[str, Document]) -> List[Document]:
         # Replace child docs with their parents, maintaining order and handling misses
         final_docs = []
         fetched_parent_ids = set()
@@ -147,25 +545,264 @@ class JapaneseHybridRetriever(BaseRetriever):
                 fetched_parent_ids.add(parent_id)
             elif not parent_id: # It's a regular chunk, not a child
                 final_docs.append(doc)
-        
         return final_docs
 
-    def _get_relevant_documents(self, query: str, *, run_manager: Optional[CallbackManagerForRetrieverRun] = None, **kwargs: Any) -> List[Document]:
-        config = kwargs.get("config")
-        
-        if self.search_type == 'ベクトル検索':
-            vres = self._vector_search(query, config=config)
+    def _fetch_parent_chunks(self, child_docs: List[Document], failures: Optional[List[str]] = None) -> List[Document]:
+        """Fetches parent chunks for a list of child documents."""
+        return self._fetch_parent_chunks_batch([child_docs], failures)[0]
+
+    def _cached_parents(self, parent_ids: List[str]) -> Tuple[Dict[str, Document], List[str]]:
+        """Splits parent IDs into cache hits and IDs that must be read from the DB."""
+        if self.parent_cache is None:
+            return {}, parent_ids
+        parent_docs_map = self.parent_cache.get_many(parent_ids)
+        return parent_docs_map, [pid for pid in parent_ids if pid not in parent_docs_map]
+
+    def _load_parents(self, parent_ids: List[str]) -> Dict[str, Document]:
+        with self.engine.connect() as conn:
+            db_result = conn.execute(text(PARENT_CHUNKS_SQL), {"parent_ids": parent_ids, "collection_name": self.config_params.collection_name})
+            parent_docs_map = self._parent_docs_map(db_result)
+        if self.parent_cache is not None:
+            self.parent_cache.put_many(parent_docs_map)
+        return parent_docs_map
+
+    def _fetch_parent_chunks_batch(self, child_doc_lists: List[List[Document]], failures: Optional[List[str]] = None) -> List[List[Document]]:
+        """Replaces children with their parents for several result lists, reading only cache misses from the DB."""
+        unique_parent_ids = self._parent_ids([doc for docs in child_doc_lists for doc in docs])
+        if not unique_parent_ids:
+            return child_doc_lists
+
+        parent_docs_map, missing_ids = self._cached_parents(unique_parent_ids)
+        if missing_ids:
+            try:
+                parent_docs_map.update(self._load_parents(missing_ids))
+            except Exception as e:
+                self._leg_failed(failures, "parent chunk fetch", e)
+                return child_doc_lists # Fallback to child docs on error
+
+        return [self._replace_with_parents(docs, parent_docs_map) for docs in child_doc_lists]
+
+    async def _afetch_parent_chunks(self, child_docs: List[Document], failures: Optional[List[str]] = None) -> List[Document]:
+        unique_parent_ids = self._parent_ids(child_docs)
+        if not unique_parent_ids:
+            return child_docs
+        parent_docs_map, missing_ids = self._cached_parents(unique_parent_ids)
+        if not missing_ids:
+            return self._replace_with_parents(child_docs, parent_docs_map)
+
+        async_engine = get_async_engine(self.connection_string)
+        if async_engine is None:
+            return await asyncio.to_thread(self._fetch_parent_chunks, child_docs, failures)
+
+        try:
+            async with async_engine.connect() as conn:
+                db_result = await conn.execute(text(PARENT_CHUNKS_SQL), {"parent_ids": missing_ids, "collection_name": self.config_params.collection_name})
+                loaded = self._parent_docs_map(db_result.fetchall())
+        except Exception as e:
+            self._leg_failed(failures, "parent chunk fetch", e)
+            return child_docs
+        if self.parent_cache is not None:
+            self.parent_cache.put_many(loaded)
+        parent_docs_map.update(loaded)
+
+        return self._replace_with_parents(child_docs, parent_docs_map)
+
+    def prefetch_parent_chunks(self, parent_ids: Optional[List[str]] = None, limit: int = 0) -> int:
+        """
+        Warms the parent cache in one query: the given parent IDs, or else the
+        `limit` most recently written parents of the collection. Returns the number loaded.
+        """
+        if self.parent_cache is None:
+            return 0
+        try:
+            if parent_ids is not None:
+                _, missing_ids = self._cached_parents(list(dict.fromkeys(parent_ids)))
+                return len(self._load_parents(missing_ids)) if missing_ids else 0
+            if limit <= 0:
+                return 0
+            with self.engine.connect() as conn:
+                db_result = conn.execute(text(RECENT_PARENT_CHUNKS_SQL), {"collection_name": self.config_params.collection_name, "limit": limit})
+                parent_docs_map = self._parent_docs_map(db_result)
+            self.parent_cache.put_many(parent_docs_map)
+            return len(parent_docs_map)
+        except Exception as e:
+            print(f"Error prefetching parent chunks: {e}")
+            return 0
+
+    def _retrieve(self, query: str, config: Optional[RunnableConfig] = None, failures: Optional[List[str]] = None) -> List[Document]:
+        if self._use_lazy_hydration:
+            retrieved_docs = self._retrieve_lazily(query, failures)
+        elif self.search_type == 'ベクトル検索':
+            vres = self._vector_search(query, config=config, failures=failures)
+            retrieved_docs = [doc for doc, score in vres]
+        elif self._use_sql_hybrid:
+            retrieved_docs = self._hybrid_search_in_sql(query, failures)
+        else: # Hybrid search; the legs run concurrently, as in `_aretrieve`
+            vres, kres = _run_legs(lambda: self._vector_search(query, config=config, failures=failures),
+                                   lambda: self._keyword_search(query, config=config, failures=failures))
+            retrieved_docs = self._reciprocal_rank_fusion_hybrid(vres, kres)
+
+        if self.config_params.enable_parent_child_chunking:
+            return self._fetch_parent_chunks(retrieved_docs, failures)
+
+        return retrieved_docs[:self.config_params.final_k]
+
+    async def _aretrieve(self, query: str, failures: Optional[List[str]] = None) -> List[Document]:
+        # Vector and keyword legs run concurrently, so hybrid latency is the slower of the two
+        if self._use_lazy_hydration:
+            retrieved_docs = await self._aretrieve_lazily(query, failures)
+        elif self.search_type == 'ベクトル検索':
+            vres = await self._avector_search(query, failures)
             retrieved_docs = [doc for doc, score in vres]
+        elif self._use_sql_hybrid:
+            retrieved_docs = await self._ahybrid_search_in_sql(query, failures)
         else: # Hybrid search
-            vres = self._vector_search(query, config=config)
-            kres = self._keyword_search(query, config=config)
+            vres, kres = await asyncio.gather(self._avector_search(query, failures), self._akeyword_search(query, failures))
             retrieved_docs = self._reciprocal_rank_fusion_hybrid(vres, kres)
 
         if self.config_params.enable_parent_child_chunking:
-            return self._fetch_parent_chunks(retrieved_docs)
-        
+            return await self._afetch_parent_chunks(retrieved_docs, failures)
+
         return retrieved_docs[:self.config_params.final_k]
 
-    async def _aget_relevant_documents(self, query: str, *, run_manager: Optional[CallbackManagerForRetrieverRun] = None, **kwargs: Any) -> List[Document]:
-        # For simplicity, using the sync version. For production, implement async I/O.
-        return self._get_relevant_documents(query, run_manager=run_manager, **kwargs)
+    def _get_relevant_documents(self, query: str, *, run_manager: Optional[CallbackManagerForRetrieverRun] = None, **kwargs: Any) -> List[Document]:
+        if self.result_cache is None:
+            return self._retrieve(query, config=kwargs.get("config"))
+
+        collection_name = self.config_params.collection_name
+        cache_key = self.result_cache.make_key(query, self.search_type, self.config_params)
+        cached = self.result_cache.get(cache_key, collection_name)
+        if cached is not None:
+            return cached
+        failures: List[str] = []
+        docs = self._retrieve(query, config=kwargs.get("config"), failures=failures)
+        # A failed leg or an empty result is returned but not cached, so the next call retries
+        if docs and not failures:
+            self.result_cache.put(cache_key, collection_name, docs)
+        return docs
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: Optional[AsyncCallbackManagerForRetrieverRun] = None, **kwargs: Any) -> List[Document]:
+        if self.result_cache is None:
+            return await self._aretrieve(query)
+
+        collection_name = self.config_params.collection_name
+        cache_key = self.result_cache.make_key(query, self.search_type, self.config_params)
+        cached = await asyncio.to_thread(self.result_cache.get, cache_key, collection_name)
+        if cached is not None:
+            return cached
+        failures: List[str] = []
+        docs = await self._aretrieve(query, failures)
+        if docs and not failures:
+            self.result_cache.put(cache_key, collection_name, docs)
+        return docs
+
+    # --- Batched retrieval (query expansion / RAG-fusion) ---
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        if self.embedding_cache is not None:
+            return self.embedding_cache.embed_queries(queries)
+        return self.vector_store.embeddings.embed_documents(queries)
+
+    @staticmethod
+    def _group_batch_rows(rows, n: int, descending: bool) -> List[List[Tuple[Document, float]]]:
+        grouped: List[List[Tuple[Document, float]]] = [[] for _ in range(n)]
+        for row in rows:
+            grouped[row.ord - 1].append((Document(page_content=row.content, metadata=_load_metadata(row.metadata)), float(row.score)))
+        for results in grouped:
+            results.sort(key=lambda x: x[1], reverse=descending)
+        return grouped
+
+    def _batch_vector_search(self, queries: List[str], failures: Optional[List[str]] = None) -> List[List[Tuple[Document, float]]]:
+        """One embedding request and one LATERAL statement for all queries."""
+        if not self.vector_store:
+            return [[] for _ in queries]
+        try:
+            embeddings = self._embed_queries(queries)
+            if self._use_local_vectors:
+                return self._hydrate_many([self.local_vectors.search(e, self.config_params.vector_search_k) for e in embeddings])
+            sql = BATCH_SEARCH_SQL.format(search_sql=self._vector_search_sql("q.query_text"))
+            params = {
+                "queries": [_to_pgvector_literal(e) for e in embeddings],
+                "collection_name": self.config_params.collection_name,
+                "k": self.config_params.vector_search_k
+            }
+            with self.engine.connect() as conn:
+                if self.vector_index is not None:
+                    self.vector_index.apply_search_settings(conn)
+                return self._group_batch_rows(conn.execute(text(sql), params), len(queries), descending=False)
+        except Exception as exc:
+            self._leg_failed(failures, "batch vector search", exc)
+            return [[] for _ in queries]
+
+    def _batch_keyword_search(self, queries: List[str], failures: Optional[List[str]] = None) -> List[List[Tuple[Document, float]]]:
+        """BM25: one hydration query. Postgres: one LATERAL statement per query kind (Japanese / FTS)."""
+        results: List[List[Tuple[Document, float]]] = [[] for _ in queries]
+        try:
+            if self._use_bm25:
+                return self._hydrate_many([self._bm25_search(q) for q in queries])
+
+            specs = [self._keyword_query_spec(q) for q in queries]
+            params = {"collection_name": self.config_params.collection_name, "keyword_k": self.config_params.keyword_search_k}
+            with self.engine.connect() as conn:
+                for kind in ("ja", "en"):
+                    positions = [i for i, spec in enumerate(specs) if spec is not None and spec[0] == kind]
+                    if not positions:
+                        continue
+                    sql = BATCH_SEARCH_SQL.format(search_sql=self._keyword_search_sql(kind, "q.query_text"))
+                    rows = conn.execute(text(sql), {**params, "queries": [specs[i][1] for i in positions]})
+                    for i, scored_docs in zip(positions, self._group_batch_rows(rows, len(positions), descending=True)):
+                        results[i] = scored_docs
+        except Exception as exc:
+            self._leg_failed(failures, "batch keyword search", exc)
+        return results
+
+    def _retrieve_batch(self, queries: List[str], failures: Optional[List[str]] = None) -> List[List[Document]]:
+        # Fusion always runs in Python here; hybrid_engine="sql" only applies to single queries
+        if self.search_type == 'ベクトル検索':
+            retrieved = [[doc for doc, score in vres] for vres in self._batch_vector_search(queries, failures)]
+        else:
+            vres_list, kres_list = _run_legs(lambda: self._batch_vector_search(queries, failures),
+                                             lambda: self._batch_keyword_search(queries, failures))
+            retrieved = [self._reciprocal_rank_fusion_hybrid(vres, kres) for vres, kres in zip(vres_list, kres_list)]
+
+        if self.config_params.enable_parent_child_chunking:
+            return self._fetch_parent_chunks_batch(retrieved, failures)
+
+        return [docs[:self.config_params.final_k] for docs in retrieved]
+
+    def batch(self, inputs: List[str], config: Optional[Union[RunnableConfig, List[RunnableConfig]]] = None,
+              *, return_exceptions: bool = False, **kwargs: Any) -> List[List[Document]]:
+        """
+        Retrieves documents for several queries at once: one embedding request,
+        one vector-search statement and at most two keyword-search statements for
+        the whole batch instead of one full retrieval per query. Duplicate queries
+        are retrieved once. Per-query callback runs are not emitted on this path.
+        """
+        if not inputs:
+            return []
+
+        collection_name = self.config_params.collection_name
+        results: List[Optional[List[Document]]] = [None] * len(inputs)
+        for i, query in enumerate(inputs):
+            if not query or not query.strip():
+                results[i] = []
+            elif self.result_cache is not None:
+                cache_key = self.result_cache.make_key(query, self.search_type, self.config_params)
+                results[i] = self.result_cache.get(cache_key, collection_name)
+
+        pending = list(dict.fromkeys(q for q, docs in zip(inputs, results) if docs is None))
+        if pending:
+            failures: List[str] = []
+            retrieved = dict(zip(pending, self._retrieve_batch(pending, failures)))
+            # The batch legs are shared statements, so one failure degrades every query in the batch
+            if self.result_cache is not None and not failures:
+                for query, docs in retrieved.items():
+                    if not docs:
+                        continue
+                    self.result_cache.put(self.result_cache.make_key(query, self.search_type, self.config_params), collection_name, docs)
+            results = [docs if docs is not None else list(retrieved[q]) for q, docs in zip(inputs, results)]
+        return results
+
+    async def abatch(self, inputs: List[str], config: Optional[Union[RunnableConfig, List[RunnableConfig]]] = None,
+                     *, return_exceptions: bool = False, **kwargs: Any) -> List[List[Document]]:
+        return await asyncio.to_thread(self.batch, inputs, config, return_exceptions=return_exceptions, **kwargs)
@@ -0,0 +1,235 @@
+"""
+Approximate-nearest-neighbour index management for the pgvector collection.
+
+langchain's PGVector stores every collection in `langchain_pg_embedding` with
+an untyped `vector` column, which cannot be indexed directly. We therefore
+create a partial expression index per collection on
+`embedding::vector(<dims>)` (or `halfvec` above pgvector's 2000-dimension
+limit for `vector` indexes). The retriever's search SQL uses the same
+expression and collection predicate so the planner can use the index.
+
+Indexes are built with CREATE INDEX CONCURRENTLY, so writes to
+`langchain_pg_embedding` continue during a build; the app starts builds in a
+background thread.
+
+IVFFlat clusters the rows present at build time into `lists` centroids, so it
+is only built once the collection holds IVFFLAT_MIN_ROWS_PER_LIST rows per list,
+and it must be rebuilt after the collection has grown substantially (recall
+degrades as new rows land in stale clusters). HNSW needs no rebuild.
+
+Usage (rebuild after changing index parameters, or after IVFFlat growth):
+    python -m rag.vector_index rebuild
+"""
+import argparse
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+
+EMBEDDING_TABLE = "langchain_pg_embedding"
+COLLECTION_TABLE = "langchain_pg_collection"
+MAX_VECTOR_INDEX_DIMS = 2000
+MAX_HALFVEC_INDEX_DIMS = 4000
+IVFFLAT_MIN_ROWS_PER_LIST = 10
+
+
+class VectorIndexManager:
+    """Creates, rebuilds and tunes the HNSW / IVFFlat index for one collection."""
+
+    def __init__(self, engine, config):
+        self.engine = engine
+        self.config = config
+        self.index_type = (config.vector_index_type or "none").lower()
+        self._collection_uuid: Optional[str] = None
+        self._dims: Optional[int] = config.embedding_dimensions or None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.index_type in ("hnsw", "ivfflat")
+
+    def _name_suffix(self) -> str:
+        return hashlib.md5(self.config.collection_name.encode("utf-8")).hexdigest()[:12]
+
+    @property
+    def index_name(self) -> str:
+        return f"idx_lc_emb_{self.index_type}_{self._name_suffix()}"
+
+    def _vector_type(self, dims: int) -> str:
+        return "halfvec" if dims > MAX_VECTOR_INDEX_DIMS else "vector"
+
+    def _resolve(self, conn) -> bool:
+        """Looks up the collection UUID and embedding dimensions; False if the collection is still empty."""
+        if self._collection_uuid is None:
+            uuid = conn.execute(
+                text(f"SELECT uuid FROM {COLLECTION_TABLE} WHERE name = :name"),
+                {"name": self.config.collection_name}
+            ).scalar()
+            if uuid is None:
+                return False
+            self._collection_uuid = str(uuid)
+        if self._dims is None:
+            dims = conn.execute(
+                text(f"SELECT vector_dims(embedding) FROM {EMBEDDING_TABLE} WHERE collection_id = CAST(:uuid AS uuid) LIMIT 1"),
+                {"uuid": self._collection_uuid}
+            ).scalar()
+            if dims is None:
+                return False
+            self._dims = int(dims)
+        return True
+
+    def _create_index_sql(self) -> str:
+        vtype = self._vector_type(self._dims)
+        opclass = f"{vtype}_cosine_ops"
+        if self.index_type == "hnsw":
+            method = "hnsw"
+            params = f"m = {int(self.config.vector_index_hnsw_m)}, ef_construction = {int(self.config.vector_index_hnsw_ef_construction)}"
+        else:
+            method = "ivfflat"
+            params = f"lists = {int(self.config.vector_index_ivfflat_lists)}"
+        return f"""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.index_name} ON {EMBEDDING_TABLE}
+            USING {method} ((embedding::{vtype}({self._dims})) {opclass}) WITH ({params})
+            WHERE collection_id = '{self._collection_uuid}'::uuid
+        """
+
+    def _collection_rows(self, conn) -> int:
+        return conn.execute(
+            text(f"SELECT count(*) FROM {EMBEDDING_TABLE} WHERE collection_id = CAST(:uuid AS uuid)"),
+            {"uuid": self._collection_uuid}
+        ).scalar() or 0
+
+    def _drop_invalid_index(self, conn):
+        """A failed concurrent build leaves an INVALID index that IF NOT EXISTS would keep forever."""
+        invalid = conn.execute(text("""
+            SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = :name AND NOT i.indisvalid
+        """), {"name": self.index_name}).scalar()
+        if invalid:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {self.index_name}"))
+
+    def resolve(self) -> bool:
+        """Resolves the collection so `search_sql` can match the index expression; False while it is empty."""
+        try:
+            with self.engine.connect() as conn:
+                return self._resolve(conn)
+        except Exception as e:
+            print(f"[VectorIndex] collection lookup error: {type(e).__name__} - {e}")
+            return False
+
+    def ensure_index(self, background: bool = False) -> bool:
+        """
+        Creates the index if it does not exist yet. Returns True when the index is
+        in place. With `background`, the build runs in a daemon thread (skipped if
+        one is already running) and the return value only says it was started.
+        """
+        if not self.enabled:
+            return False
+        if background:
+            if self._lock.locked():
+                return False
+            threading.Thread(target=self.ensure_index, name="vector-index-build", daemon=True).start()
+            return True
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            # CONCURRENTLY cannot run inside a transaction block
+            with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                if not self._resolve(conn):
+                    return False
+                if self._dims > MAX_HALFVEC_INDEX_DIMS:
+                    print(f"[VectorIndex] {self._dims} dimensions exceed the pgvector index limit; skipping.")
+                    return False
+                if self.index_type == "ivfflat":
+                    min_rows = IVFFLAT_MIN_ROWS_PER_LIST * int(self.config.vector_index_ivfflat_lists)
+                    rows = self._collection_rows(conn)
+                    if rows < min_rows:
+                        print(f"[VectorIndex] {rows} rows is too few for ivfflat with "
+                              f"{self.config.vector_index_ivfflat_lists} lists; waiting for {min_rows}.")
+                        return False
+                self._drop_invalid_index(conn)
+                conn.execute(text(self._create_index_sql()))
+            return True
+        except Exception as e:
+            print(f"[VectorIndex] index creation error: {type(e).__name__} - {e}")
+            return False
+        finally:
+            self._lock.release()
+
+    def rebuild_index(self) -> bool:
+        """Drops every ANN index of this collection and builds it again with the current parameters."""
+        with self._lock:
+            self._collection_uuid = None
+            self._dims = self.config.embedding_dimensions or None
+            try:
+                with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                    names = conn.execute(
+                        text("SELECT indexname FROM pg_indexes WHERE tablename = :table AND indexname LIKE :pattern"),
+                        {"table": EMBEDDING_TABLE, "pattern": f"idx_lc_emb_%_{self._name_suffix()}"}
+                    ).scalars().all()
+                    for name in names:
+                        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            except Exception as e:
+                print(f"[VectorIndex] index drop error: {type(e).__name__} - {e}")
+                return False
+        return self.ensure_index()
+
+    def search_sql(self, query_vector: str = ":embedding") -> Optional[str]:
+        """
+        Returns the cosine search SQL that matches the index expression, or None
+        when the collection has not been resolved yet (callers use the plain query).
+        `query_vector` is the SQL expression holding the query vector text.
+        """
+        if not self.enabled or self._collection_uuid is None or self._dims is None:
+            return None
+        vtype = self._vector_type(self._dims)
+        return f"""
+            SELECT e.custom_id AS chunk_id, e.document AS content, e.cmetadata AS metadata,
+                   (e.embedding::{vtype}({self._dims})) <=> CAST({query_vector} AS {vtype}({self._dims})) AS score
+            FROM {EMBEDDING_TABLE} e
+            WHERE e.collection_id = '{self._collection_uuid}'::uuid
+            ORDER BY score ASC LIMIT :k
+        """
+
+    def search_settings(self) -> Dict[str, Any]:
+        """Query-time index parameters, applied with set_config(..., is_local => true)."""
+        if self.index_type == "hnsw":
+            return {"hnsw.ef_search": str(int(self.config.vector_search_ef_search))}
+        if self.index_type == "ivfflat":
+            return {"ivfflat.probes": str(int(self.config.vector_search_ivfflat_probes))}
+        return {}
+
+    def apply_search_settings(self, conn):
+        for name, value in self.search_settings().items():
+            conn.execute(text("SELECT set_config(:name, :value, true)"), {"name": name, "value": value})
+
+    async def aapply_search_settings(self, conn):
+        for name, value in self.search_settings().items():
+            await conn.execute(text("SELECT set_config(:name, :value, true)"), {"name": name, "value": value})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the pgvector ANN index of the RAG collection.")
+    parser.add_argument("command", choices=["ensure", "rebuild"])
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    from .config import Config
+    from .db import get_engine
+    try:
+        import psycopg  # noqa: F401
+        dialect = "psycopg"
+    except ModuleNotFoundError:
+        dialect = "psycopg2"
+
+    cfg = Config()
+    connection_string = f"postgresql+{dialect}://{cfg.db_user}:{cfg.db_password}@{cfg.db_host}:{cfg.db_port}/{cfg.db_name}"
+    manager = VectorIndexManager(get_engine(connection_string, cfg), cfg)
+    ok = manager.rebuild_index() if args.command == "rebuild" else manager.ensure_index()
+    print(f"[VectorIndex] {args.command} {'succeeded' if ok else 'did not create an index'}: {manager.index_name}")
+
+
+if __name__ == "__main__":
+    main()
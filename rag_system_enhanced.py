@@ -12,7 +12,7 @@ from pathlib import Path
 from typing import List, Dict, Any, Optional
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
@@ -30,9 +30,18 @@ from langchain_community.callbacks.manager import get_openai_callback
 
 # --- Refactored Module Imports ---
 from rag.config import Config
+from rag.db import get_engine_registry
 from rag.text_processor import JapaneseTextProcessor
 from rag.jargon import JargonDictionaryManager
 from rag.retriever import JapaneseHybridRetriever
+from rag.embedding_cache import CachedEmbeddings, QueryEmbeddingCache, init_embedding_cache_table
+from rag.result_cache import RetrievalResultCache, init_collection_versions_table
+from rag.vector_index import VectorIndexManager
+from rag.bm25 import load_or_build_bm25_index
+from rag.parent_cache import ParentChunkCache
+from rag.local_vectors import load_or_build_local_vector_index
+from rag.document_registry import init_document_registry_table
+from rag.image_summary_cache import init_image_summary_cache_table
 from rag.ingestion import IngestionHandler
 from rag.sql_handler import SQLHandler
 from rag.chains import create_chains, create_retrieval_chain, create_full_rag_chain
@@ -50,6 +59,9 @@ class RAGSystem:
         self.config = cfg
         self.text_processor = JapaneseTextProcessor()
         self.connection_string = f"postgresql+{_PG_DIALECT}://{cfg.db_user}:{cfg.db_password}@{cfg.db_host}:{cfg.db_port}/{cfg.db_name}"
+        # One pooled engine per connection string, shared by every component
+        self.engine_registry = get_engine_registry()
+        self.engine = self.engine_registry.get_engine(self.connection_string, cfg)
         
         self._init_llms_and_embeddings()
         self._init_db()
@@ -59,19 +71,83 @@ class RAGSystem:
             collection_name=cfg.collection_name,
             embedding_function=self.embeddings,
             use_jsonb=True,
-            distance_strategy=DistanceStrategy.COSINE
+            distance_strategy=DistanceStrategy.COSINE,
+            connection=self.engine
         )
         
+        self.vector_index = VectorIndexManager(self.engine, cfg)
+        self.vector_index.resolve()
+        # A first build on a large collection can take long; it runs CONCURRENTLY off the startup path
+        self.vector_index.ensure_index(background=True)
+
+        self.embedding_cache = None
+        if cfg.enable_query_embedding_cache:
+            self.embedding_cache = QueryEmbeddingCache(
+                self.embeddings, cfg.azure_openai_embedding_deployment_name, self.text_processor,
+                max_entries=cfg.query_embedding_cache_size, ttl_seconds=cfg.query_embedding_cache_ttl
+            )
+
+        self.result_cache = None
+        if cfg.enable_result_cache:
+            self.result_cache = RetrievalResultCache(
+                self.engine, max_entries=cfg.result_cache_size, ttl_seconds=cfg.result_cache_ttl,
+                version_check_interval=cfg.result_cache_version_check_interval
+            )
+
+        self.parent_cache = None
+        if cfg.enable_parent_child_chunking and cfg.enable_parent_chunk_cache:
+            self.parent_cache = ParentChunkCache(
+                max_entries=cfg.parent_chunk_cache_size, max_bytes=cfg.parent_chunk_cache_max_mb * 1024 * 1024,
+                ttl_seconds=cfg.parent_chunk_cache_ttl
+            )
+
+        self.bm25_index = None
+        if cfg.keyword_engine == "bm25":
+            self.bm25_index = load_or_build_bm25_index(
+                self.engine, cfg.collection_name, self._bm25_snapshot_path(), k1=cfg.bm25_k1, b=cfg.bm25_b,
+                tokenizer=self._bm25_tokenize
+            )
+
+        self.local_vectors = None
+        if cfg.vector_engine == "local":
+            self.local_vectors = load_or_build_local_vector_index(
+                self.engine, cfg.local_vector_dir, cfg.collection_name, dtype=cfg.local_vector_dtype
+            )
+
         self.retriever = JapaneseHybridRetriever(
             vector_store=self.vector_store,
             connection_string=self.connection_string,
             config_params=cfg,
-            text_processor=self.text_processor
+            text_processor=self.text_processor,
+            engine=self.engine,
+            embedding_cache=self.embedding_cache,
+            result_cache=self.result_cache,
+            vector_index=self.vector_index,
+            bm25_index=self.bm25_index,
+            parent_cache=self.parent_cache,
+            local_vectors=self.local_vectors
         )
+        if self.parent_cache is not None and cfg.parent_chunk_cache_prefetch > 0:
+            self.retriever.prefetch_parent_chunks(limit=cfg.parent_chunk_cache_prefetch)
 
-        self.jargon_manager = JargonDictionaryManager(self.connection_string, cfg.jargon_table_name)
-        self.ingestion_handler = IngestionHandler(cfg, self.vector_store, self.text_processor, self.connection_string)
-        self.sql_handler = SQLHandler(cfg, self.llm, self.connection_string)
+        self.jargon_manager = JargonDictionaryManager(self.connection_string, cfg.jargon_table_name, engine=self.engine)
+        self.ingestion_handler = IngestionHandler(cfg, self.vector_store, self.text_processor, self.connection_string, engine=self.engine)
+        if self.result_cache is not None:
+            self.ingestion_handler.add_change_listener(self.result_cache.invalidate)
+        if self.parent_cache is not None:
+            self.ingestion_handler.add_chunk_listener(on_stored=self.parent_cache.on_chunks_stored, on_deleted=self.parent_cache.on_chunks_deleted)
+        if self.bm25_index is not None:
+            self.ingestion_handler.add_chunk_listener(on_stored=self.bm25_index.add_rows, on_deleted=self.bm25_index.remove_many)
+            self.ingestion_handler.add_version_listener(self.bm25_index.advance_version)
+            self.ingestion_handler.add_batch_listener(self._snapshot_bm25_index)
+        if self.local_vectors is not None:
+            self.ingestion_handler.add_chunk_listener(on_stored=self.local_vectors.on_chunks_stored, on_deleted=self.local_vectors.remove_many)
+            self.ingestion_handler.add_version_listener(self.local_vectors.advance_version)
+            self.ingestion_handler.add_batch_listener(self.local_vectors.checkpoint)
+        if self.vector_index.enabled:
+            # The index can only be created once the collection has embeddings
+            self.ingestion_handler.add_batch_listener(lambda _: self.vector_index.ensure_index(background=True))
+        self.sql_handler = SQLHandler(cfg, self.llm, self.connection_string, engine=self.engine)
 
         # Create the modular chains
         self.retrieval_chain = create_retrieval_chain(self.llm, self.retriever, self.jargon_manager, self.config)
@@ -95,18 +171,81 @@ class RAGSystem:
             azure_endpoint=cfg.azure_openai_endpoint, api_key=cfg.azure_openai_api_key, 
             api_version=cfg.azure_openai_api_version, azure_deployment=cfg.azure_openai_embedding_deployment_name
         )
+        if cfg.enable_persistent_embedding_cache:
+            # Every consumer (vector store, ingestion, retriever) reuses embeddings already in the embedding_cache table
+            self.embeddings = CachedEmbeddings(self.embeddings, cfg.azure_openai_embedding_deployment_name, self.engine)
         print("RAGSystem initialized with Azure OpenAI.")
 
     def _init_db(self):
-        engine = create_engine(self.connection_string)
-        with engine.connect() as conn:
+        with self.engine.connect() as conn:
             conn.execute(text("CREATE TABLE IF NOT EXISTS document_chunks (chunk_id TEXT PRIMARY KEY, collection_name TEXT, document_id TEXT, content TEXT, tokenized_content TEXT, metadata JSONB, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);"))
             conn.execute(text("CREATE INDEX IF NOT EXISTS idx_doc_chunks_coll_doc ON document_chunks(collection_name, document_id);"))
+            self._ensure_fts_columns(conn)
+            init_collection_versions_table(conn)
+            init_document_registry_table(conn)
+            if self.config.enable_image_summary_cache:
+                init_image_summary_cache_table(conn)
+            if self.config.enable_persistent_embedding_cache:
+                init_embedding_cache_table(conn)
             conn.commit()
 
+    @staticmethod
+    def _generated_column_expr(conn, column: str) -> Optional[str]:
+        """The generation expression of a document_chunks column, or None if it does not exist."""
+        return conn.execute(text("""
+            SELECT pg_get_expr(d.adbin, d.adrelid)
+            FROM pg_attrdef d
+            JOIN pg_attribute a ON a.attrelid = d.adrelid AND a.attnum = d.adnum
+            WHERE d.adrelid = 'document_chunks'::regclass AND a.attname = :column
+        """), {"column": column}).scalar()
+
+    def _ensure_fts_columns(self, conn):
+        """
+        Maintains the GIN-indexed tsvector columns used by keyword search.
+
+        - `content_tsv`: `content` parsed in the configured FTS language; rebuilt
+          when `fts_language` changes.
+        - `tokenized_tsv`: the Janome tokens in `tokenized_content`, parsed with the
+          'simple' configuration (no stemming or stop words) so positions and term
+          frequencies are kept for ranking; query tokens go through the same parser.
+
+        Both are stored generated columns: adding them backfills existing rows,
+        and Postgres keeps them current on every insert/update.
+        """
+        lang = self.config.fts_language
+        current_expr = self._generated_column_expr(conn, "content_tsv")
+        if current_expr is not None and f"'{lang}'::regconfig" not in current_expr:
+            conn.execute(text("ALTER TABLE document_chunks DROP COLUMN content_tsv;"))
+        conn.execute(text(f"ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('{lang}'::regconfig, coalesce(content, ''))) STORED;"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_doc_chunks_content_tsv ON document_chunks USING GIN(content_tsv);"))
+
+        tokenized_expr = self._generated_column_expr(conn, "tokenized_tsv")
+        if tokenized_expr is not None and "array_to_tsvector" in tokenized_expr:
+            # The earlier build kept no positions or frequencies
+            conn.execute(text("ALTER TABLE document_chunks DROP COLUMN tokenized_tsv;"))
+        conn.execute(text("""
+            ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS tokenized_tsv tsvector
+            GENERATED ALWAYS AS (to_tsvector('simple'::regconfig, coalesce(tokenized_content, ''))) STORED;
+        """))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_doc_chunks_tokenized_tsv ON document_chunks USING GIN(tokenized_tsv);"))
+
+    def _bm25_snapshot_path(self) -> str:
+        return os.path.join(self.config.bm25_snapshot_dir, f"{self.config.collection_name}.pkl")
+
+    def _bm25_tokenize(self, content: str) -> List[str]:
+        """Tokenizes chunk content the way HybridRetriever tokenizes BM25 queries."""
+        return self.text_processor.tokenize(self.text_processor.normalize_text(content))
+
+    def _snapshot_bm25_index(self, collection_name: str):
+        """Persists the BM25 index tagged with the version it reflects (see `BM25Index.advance_version`)."""
+        try:
+            self.bm25_index.save(self._bm25_snapshot_path())
+        except Exception as e:
+            print(f"[BM25] snapshot error: {type(e).__name__} - {e}")
+
     # --- Method Delegation ---
-    def ingest_documents(self, paths: List[str]):
-        return self.ingestion_handler.ingest_documents(paths)
+    def ingest_documents(self, paths: List[str], force: bool = False):
+        return self.ingestion_handler.ingest_documents(paths, force=force)
 
     def delete_document_by_id(self, doc_id: str) -> tuple[bool, str]:
         return self.ingestion_handler.delete_document_by_id(doc_id)
@@ -123,6 +262,27 @@ class RAGSystem:
     def get_chunks_by_document_id(self, document_id: str):
         return self.sql_handler.get_chunks_by_document_id(document_id)
 
+    def rebuild_vector_index(self) -> bool:
+        """Drops and rebuilds the ANN index with the current index parameters."""
+        return self.vector_index.rebuild_index()
+
+    def get_pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns connection pool utilization for all shared engines."""
+        return self.engine_registry.pool_stats()
+
+    def get_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns hit/miss statistics for the retrieval caches."""
+        stats = {}
+        if self.embedding_cache is not None:
+            stats["query_embedding"] = self.embedding_cache.stats()
+        if self.result_cache is not None:
+            stats["retrieval_result"] = self.result_cache.stats()
+        if self.parent_cache is not None:
+            stats["parent_chunk"] = self.parent_cache.stats()
+        if isinstance(self.embeddings, CachedEmbeddings):
+            stats["persistent_embedding"] = self.embeddings.stats()
+        return stats
+
     # --- Core Query Logic ---
     def query(self, question: str, *, use_query_expansion: bool = False, use_rag_fusion: bool = False, use_jargon_augmentation: bool = True, use_reranking: bool = True, search_type: str = "ハイブリッド検索", config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
         """Executes the main RAG chain for a standard RAG query."""
@@ -24,12 +24,14 @@ from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 from sudachipy import tokenizer, dictionary
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 
 # --- Project-specific imports ---
 # 親ディレクトリをパスに追加してragモジュールをインポート
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 from rag.config import Config
+from rag.db import get_engine
+from rag.embedding_cache import CachedEmbeddings, init_embedding_cache_table
 
 # ── ENV ───────────────────────────────────────────
 load_dotenv()
@@ -80,6 +82,13 @@ embeddings = AzureOpenAIEmbeddings(
     api_version=cfg.azure_openai_api_version,
     azure_deployment=cfg.azure_openai_embedding_deployment_name
 )
+if cfg.enable_persistent_embedding_cache:
+    # 再実行時は同じテキストの埋め込みを embedding_cache から再利用する
+    # (チャンク分割が取り込み時と異なるため、取り込み済みのベクトルとはほぼ一致しない)
+    _cache_engine = get_engine(PG_URL)
+    with _cache_engine.begin() as _conn:
+        init_embedding_cache_table(_conn)
+    embeddings = CachedEmbeddings(embeddings, cfg.azure_openai_embedding_deployment_name, _cache_engine)
 
 # ── Vector Store Components ──────────────────────
 class VectorStore:
@@ -279,7 +288,7 @@ def generate_candidates_from_chunk(text: str) -> List[str]:
 # ── Database Saving Function ──────────────────────
 def _save_terms_to_db(terms: List[Dict[str, Any]]):
     """抽出した用語をPostgreSQLに保存"""
-    engine = create_engine(PG_URL)
+    engine = get_engine(PG_URL)
     sql = text(
         f"""
         INSERT INTO {JARGON_TABLE_NAME} (term, definition, domain, aliases)
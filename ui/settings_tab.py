@@ -60,6 +60,13 @@ def render_settings_tab(rag_system, env_defaults):
     st.markdown("### 📋 現在の有効な設定")
     _display_current_config(rag_system)
 
+    if rag_system and hasattr(rag_system, 'get_pool_stats'):
+        with st.expander("🔌 DB接続プールの状態", expanded=False):
+            st.json(rag_system.get_pool_stats())
+    if rag_system and hasattr(rag_system, 'get_cache_stats'):
+        with st.expander("🗂️ キャッシュ統計", expanded=False):
+            st.json(rag_system.get_cache_stats())
+
 def _render_azure_settings(values):
     st.markdown("#### 🔑 Azure OpenAI 設定")
     st.session_state.form_values = {}
@@ -3,10 +3,12 @@ import tempfile
 from pathlib import Path
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from datetime import datetime
 from typing import Dict, Any
 
+from rag.db import get_engine
+
 try:
     import plotly.graph_objects as go
     import plotly.express as px
@@ -33,7 +35,7 @@ def get_collection_statistics(rag: RAGSystem) -> Dict[str, Any]:
     if not rag:
         return {"documents": 0, "chunks": 0, "collection_name": "N/A"}
     try:
-        engine = create_engine(rag.connection_string)
+        engine = getattr(rag, "engine", None) or get_engine(rag.connection_string)
         with engine.connect() as conn:
             query = text("SELECT COUNT(DISTINCT document_id) AS num_documents, COUNT(*) AS num_chunks FROM document_chunks WHERE collection_name = :collection")
             result = conn.execute(query, {"collection": rag.config.collection_name}).first()
@@ -50,7 +52,7 @@ def get_documents_dataframe(rag: RAGSystem) -> pd.DataFrame:
     if not rag:
         return pd.DataFrame()
     try:
-        engine = create_engine(rag.connection_string)
+        engine = getattr(rag, "engine", None) or get_engine(rag.connection_string)
         with engine.connect() as conn:
             query = text("SELECT document_id, COUNT(*) as chunk_count, MAX(created_at) as last_updated FROM document_chunks WHERE collection_name = :collection GROUP BY document_id ORDER BY last_updated DESC")
             result = conn.execute(query, {"collection": rag.config.collection_name})
@@ -189,7 +191,7 @@ def load_terms_from_db(pg_url: str, jargon_table_name: str, keyword: str = "") -
         return pd.DataFrame()
     
     try:
-        engine = create_engine(pg_url)
+        engine = get_engine(pg_url)
         
         # テーブルの存在確認
         with engine.connect() as conn: